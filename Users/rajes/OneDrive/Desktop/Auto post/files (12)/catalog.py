@@ -0,0 +1,214 @@
+"""
+catalog.py – Streaming export / import / re-enrich tool for the movies catalog.
+
+Usage (from the project root):
+    python -m shared.catalog export movies.jsonl.gz
+    python -m shared.catalog import movies.jsonl.gz
+    python -m shared.catalog reenrich --concurrency 4
+
+• export   – stream every document through a batched cursor into JSONL
+             (gzip-compressed when the path ends in .gz).  Memory use is
+             bounded by the cursor batch size, not the catalog size.
+• import   – read JSONL back in unordered insert_many batches; documents
+             whose _id / unique_id already exist are counted and skipped.
+• reenrich – re-run fetch_imdb_data for documents whose IMDb data is
+             missing (imdb.year == "N/A"), with bounded concurrency.
+
+Documents are serialised with bson.json_util (relaxed mode) so ObjectId and
+datetime values survive the round trip.
+"""
+
+import argparse
+import asyncio
+import gzip
+import logging
+import time
+from typing import IO
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from .database import init_db, close_db, get_db
+from .imdb import fetch_imdb_data, init_providers
+
+logger = logging.getLogger(__name__)
+
+_DUPLICATE_KEY = 11000
+_PROGRESS_EVERY = 5000
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    """Open *path* as text, transparently handling .gz files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+# ── Export ─────────────────────────────────────────────────────────────────────
+
+async def export_catalog(path: str, batch_size: int) -> int:
+    """Stream the movies collection to *path*. Returns the document count."""
+    db = get_db()
+    started = time.monotonic()
+    count = 0
+
+    with _open(path, "w") as fh:
+        cursor = db["movies"].find({}).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            fh.write(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS))
+            fh.write("\n")
+            count += 1
+            if count % _PROGRESS_EVERY == 0:
+                logger.info("Exported %s documents…", count)
+
+    logger.info("Export complete: %s documents → %s (%.1fs)", count, path, time.monotonic() - started)
+    return count
+
+
+# ── Import ─────────────────────────────────────────────────────────────────────
+
+async def _insert_batch(batch: list[dict]) -> tuple[int, int]:
+    """Insert one batch unordered. Returns (inserted, duplicates)."""
+    db = get_db()
+    try:
+        result = await db["movies"].insert_many(batch, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as exc:
+        details = exc.details
+        errors = details.get("writeErrors", [])
+        duplicates = sum(1 for err in errors if err.get("code") == _DUPLICATE_KEY)
+        for err in errors:
+            if err.get("code") != _DUPLICATE_KEY:
+                logger.error("Import error at batch index %s: %s", err.get("index"), err.get("errmsg"))
+        return details.get("nInserted", 0), duplicates
+
+
+async def import_catalog(path: str, batch_size: int) -> tuple[int, int]:
+    """
+    Load documents from *path* into the movies collection.
+    Returns (inserted, duplicates).
+    """
+    started = time.monotonic()
+    inserted = duplicates = read = 0
+    batch: list[dict] = []
+
+    with _open(path, "r") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            batch.append(json_util.loads(line))
+            read += 1
+            if len(batch) >= batch_size:
+                ok, dup = await _insert_batch(batch)
+                inserted += ok
+                duplicates += dup
+                batch = []
+                if read % _PROGRESS_EVERY < batch_size:
+                    logger.info(
+                        "Read %s documents (%s inserted, %s duplicates)…", read, inserted, duplicates
+                    )
+    if batch:
+        ok, dup = await _insert_batch(batch)
+        inserted += ok
+        duplicates += dup
+
+    logger.info(
+        "Import complete: %s read, %s inserted, %s duplicates skipped (%.1fs)",
+        read,
+        inserted,
+        duplicates,
+        time.monotonic() - started,
+    )
+    return inserted, duplicates
+
+
+# ── Re-enrich ──────────────────────────────────────────────────────────────────
+
+async def reenrich_catalog(concurrency: int, limit: int) -> tuple[int, int]:
+    """
+    Re-fetch IMDb data for documents whose lookup previously failed.
+
+    A bounded queue between the cursor and *concurrency* workers keeps both
+    memory use and the OMDb request rate constant.  Returns (checked, enriched).
+    """
+    db = get_db()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    checked = enriched = 0
+
+    async def worker() -> None:
+        nonlocal checked, enriched
+        while True:
+            doc = await queue.get()
+            try:
+                if doc is None:
+                    return
+                imdb = await fetch_imdb_data(doc["cleaned_title"])
+                checked += 1
+                if imdb["year"] != "N/A":
+                    await db["movies"].update_one({"_id": doc["_id"]}, {"$set": {"imdb": imdb}})
+                    enriched += 1
+                    logger.debug("Enriched '%s' (%s)", doc["cleaned_title"], imdb["year"])
+                if checked % 100 == 0:
+                    logger.info("Checked %s documents (%s enriched)…", checked, enriched)
+            except Exception as exc:
+                logger.error("Re-enrich failed for %s: %s", doc and doc.get("unique_id"), exc)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+
+    cursor = db["movies"].find(
+        {"imdb.year": "N/A"},
+        projection={"_id": 1, "unique_id": 1, "cleaned_title": 1},
+    ).batch_size(max(concurrency * 10, 100))
+    if limit:
+        cursor = cursor.limit(limit)
+
+    async for doc in cursor:
+        await queue.put(doc)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+
+    logger.info("Re-enrich complete: %s checked, %s enriched.", checked, enriched)
+    return checked, enriched
+
+
+# ── CLI ────────────────────────────────────────────────────────────────────────
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m shared.catalog", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="stream the catalog to JSONL(.gz)")
+    exp.add_argument("path")
+    exp.add_argument("--batch-size", type=int, default=1000)
+
+    imp = sub.add_parser("import", help="load a JSONL(.gz) export")
+    imp.add_argument("path")
+    imp.add_argument("--batch-size", type=int, default=1000)
+
+    ren = sub.add_parser("reenrich", help="re-fetch IMDb data for N/A records")
+    ren.add_argument("--concurrency", type=int, default=4)
+    ren.add_argument("--limit", type=int, default=0, help="max documents (0 = all)")
+
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = _parse_args()
+    await init_db()
+    try:
+        if args.command == "export":
+            await export_catalog(args.path, args.batch_size)
+        elif args.command == "import":
+            await import_catalog(args.path, args.batch_size)
+        elif args.command == "reenrich":
+            init_providers()
+            await reenrich_catalog(args.concurrency, args.limit)
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -18,6 +18,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def _parse_id_list(raw: str) -> list[int]:
+    """Parse a comma-separated list of chat / user IDs ("-1001, -1002")."""
+    return [int(x) for x in raw.replace(" ", "").split(",") if x]
+
+
+def _parse_routes(raw: str) -> dict[str, list[int]]:
+    """
+    Parse CHANNEL_ROUTES: semicolon-separated ``language=chat_id[,chat_id…]``
+    rules, e.g. ``tamil=-1001;telugu=-1002,-1003;*=-1004``.
+    Language names are lower-cased; ``*`` matches every file.  Aliases
+    ("tam", "hin", …) are mapped to canonical names in utils.
+    """
+    routes: dict[str, list[int]] = {}
+    for rule in raw.split(";"):
+        if not rule.strip():
+            continue
+        lang, _, ids = rule.partition("=")
+        routes.setdefault(lang.strip().lower(), []).extend(_parse_id_list(ids))
+    return routes
+
+
 # ── Telegram API ───────────────────────────────────────────────────────────────
 API_ID: int = int(os.environ["API_ID"])
 API_HASH: str = os.environ["API_HASH"]
@@ -26,9 +48,17 @@ AUTO_POSTER_BOT_TOKEN: str = os.environ["AUTO_POSTER_BOT_TOKEN"]
 FILE_STORE_BOT_TOKEN: str = os.environ["FILE_STORE_BOT_TOKEN"]
 
 # Channel IDs (negative integers for supergroups/channels)
-SOURCE_CHANNEL: int = int(os.environ["SOURCE_CHANNEL"])
+# SOURCE_CHANNELS (comma-separated) takes precedence over the single
+# SOURCE_CHANNEL; every listed channel is watched by AutoPosterBot.
+SOURCE_CHANNELS: list[int] = _parse_id_list(
+    os.getenv("SOURCE_CHANNELS") or os.environ["SOURCE_CHANNEL"]
+)
 MAIN_CHANNEL: int = int(os.environ["MAIN_CHANNEL"])
 
+# Language → destination channel routing (see _parse_routes).
+# Files matching no rule are posted to MAIN_CHANNEL.
+CHANNEL_ROUTES: dict[str, list[int]] = _parse_routes(os.getenv("CHANNEL_ROUTES", ""))
+
 # FileStoreBot public username (no @) – used for deep-link generation
 FILE_STORE_BOT_USERNAME: str = os.environ["FILE_STORE_BOT_USERNAME"]
 
@@ -40,7 +70,68 @@ MONGO_DB_NAME: str = os.getenv("MONGO_DB_NAME", "telegram_autopost")
 OMDB_API_KEY: str = os.environ["OMDB_API_KEY"]
 OMDB_BASE_URL: str = "https://www.omdbapi.com/"
 
+OMDB_TIMEOUT: float = float(os.getenv("OMDB_TIMEOUT", "10"))
+
+# ── Metadata providers ─────────────────────────────────────────────────────────
+# Ordered, comma-separated provider chain: omdb | omdb-mirror | local.
+# Providers are raced; the first good answer wins and the rest are cancelled.
+METADATA_PROVIDERS: list[str] = [
+    x.strip().lower() for x in os.getenv("METADATA_PROVIDERS", "omdb").split(",") if x.strip()
+]
+# Seconds to wait before starting the next provider in the chain
+# (0 = start all at once).
+METADATA_HEDGE_DELAY: float = float(os.getenv("METADATA_HEDGE_DELAY", "0"))
+
+# Second OMDb-compatible HTTP endpoint (self-hosted mirror / proxy)
+OMDB_MIRROR_URL: str = os.getenv("OMDB_MIRROR_URL", "")
+OMDB_MIRROR_API_KEY: str = os.getenv("OMDB_MIRROR_API_KEY", OMDB_API_KEY)
+OMDB_MIRROR_TIMEOUT: float = float(os.getenv("OMDB_MIRROR_TIMEOUT", "10"))
+
+# Offline title database: JSON array or JSONL of records using the
+# normalised keys (title, year, rating, genre, director, plot, poster)
+LOCAL_TITLE_DB: str = os.getenv("LOCAL_TITLE_DB", "")
+
+# Circuit breaker (per provider): after OMDB_BREAKER_THRESHOLD consecutive
+# failures, skip that provider for OMDB_BREAKER_COOLDOWN seconds.
+OMDB_BREAKER_THRESHOLD: int = int(os.getenv("OMDB_BREAKER_THRESHOLD", "5"))
+OMDB_BREAKER_COOLDOWN: float = float(os.getenv("OMDB_BREAKER_COOLDOWN", "60"))
+
+# Deferred enrichment: if > 0, AutoPosterBot waits at most this many seconds
+# for IMDb data, posts with a minimal caption if it is not ready, and edits
+# the post once the lookup finishes.  0 = always wait (no deferral).
+METADATA_LATENCY_BUDGET: float = float(os.getenv("METADATA_LATENCY_BUDGET", "0"))
+# Optional image used for deferred posts so the real poster can be swapped
+# in later (Telegram cannot turn a text post into a photo post).
+PLACEHOLDER_POSTER_URL: str = os.getenv("PLACEHOLDER_POSTER_URL", "")
+
 # ── Unique ID ──────────────────────────────────────────────────────────────────
 UNIQUE_ID_LENGTH: int = 8
 
+# ── Shutdown / concurrency (both bots) ─────────────────────────────────────────
+# Max handler calls + background tasks running at once
+MAX_INFLIGHT_TASKS: int = int(os.getenv("MAX_INFLIGHT_TASKS", "16"))
+# Seconds to wait for in-flight work on SIGTERM before cancelling it.
+SHUTDOWN_DRAIN_TIMEOUT: float = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+# Seconds allowed for the Telegram client to stop after the drain; handlers
+# still running then are cancelled.  Keep DRAIN + STOP (+ a few seconds for
+# the final flush) below systemd's TimeoutStopSec.
+SHUTDOWN_STOP_TIMEOUT: float = float(os.getenv("SHUTDOWN_STOP_TIMEOUT", "5"))
+
+# ── FileStoreBot admin / delivery stats ───────────────────────────────────────
+# Comma-separated Telegram user IDs allowed to run admin commands (/stats)
+ADMIN_IDS: list[int] = _parse_id_list(os.getenv("ADMIN_IDS", ""))
+
+# Write-behind delivery log: events are buffered in memory and flushed to
+# MongoDB in bulk every DELIVERY_FLUSH_INTERVAL seconds (or sooner when the
+# buffer reaches DELIVERY_BUFFER_MAX events).
+DELIVERY_BUFFER_MAX: int = int(os.getenv("DELIVERY_BUFFER_MAX", "5000"))
+DELIVERY_FLUSH_INTERVAL: float = float(os.getenv("DELIVERY_FLUSH_INTERVAL", "10"))
+
+# Size of the capped `deliveries` collection (bytes)
+DELIVERIES_CAP_BYTES: int = int(os.getenv("DELIVERIES_CAP_BYTES", str(64 * 1024 * 1024)))
+
+# /stats: number of entries per list and how often the lists are recomputed
+STATS_TOP_N: int = int(os.getenv("STATS_TOP_N", "10"))
+STATS_REFRESH_INTERVAL: float = float(os.getenv("STATS_REFRESH_INTERVAL", "300"))
+
 logger.info("Configuration loaded successfully.")
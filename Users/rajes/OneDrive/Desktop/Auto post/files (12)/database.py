@@ -6,22 +6,56 @@ Collection schema (movies):
     unique_id    : str  – 8-char alphanumeric, indexed unique
     file_id      : str  – Telegram file_id
     cleaned_title: str  – human-readable movie title
+    dedup_key    : str | None – canonical title (+ year) key, see
+                   utils.make_dedup_key; None when the title has no usable key
     quality      : str  – 4K | 1080p | 720p | 480p | HD
+    bundle_id    : str  – 8-char ID shared by every quality of one title
+                   and lang_key (year and no-year keys join one bundle),
+                   allocated through ``bundles``
+    media_type   : str  – video | document
+    languages    : list[str] – audio languages detected in the filename
+    lang_key     : str  – sorted, comma-joined languages ("" if none)
+                   (dedup_key, quality, lang_key) is unique when dedup_key is set
+    duplicate    : bool – set by migrations on a document whose key was
+                   already taken; its dedup_key is left None
     imdb         : dict – title, year, rating, genre, director, plot, poster
     created_at   : datetime (UTC)
+    downloads    : int  – delivery counter (maintained by FileStoreBot)
+    last_downloaded_at : datetime (UTC)
+
+Collection schema (bundles):
+    key          : str  – "<dedup_key>#<lang_key>", indexed unique
+    bundle_id    : str  – indexed unique
+    created_at   : datetime (UTC)
+
+Collection schema (deliveries, capped):
+    unique_id    : str
+    user_id      : int
+    delivered_at : datetime (UTC)
+
+Collection schema (pending_ingests):
+    chat_id      : int  – source channel
+    message_id   : int  – (chat_id, message_id) indexed unique
+    queued_at    : datetime (UTC)
 """
 
 import logging
-from datetime import datetime, timezone
+import re
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 import motor.motor_asyncio
-from pymongo import ASCENDING, IndexModel
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
 
-from .config import MONGO_URI, MONGO_DB_NAME
+from .config import MONGO_URI, MONGO_DB_NAME, DELIVERIES_CAP_BYTES
+from .utils import make_dedup_key, make_lang_key, generate_unique_id
 
 logger = logging.getLogger(__name__)
 
+_DUPLICATE_KEY = 11000
+
 # ── Motor client (module-level singleton) ─────────────────────────────────────
 _client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
 _db: Optional[motor.motor_asyncio.AsyncIOMotorDatabase] = None
@@ -55,11 +89,74 @@ async def init_db() -> None:
                 unique=False,
                 name="idx_title_quality",
             ),
+            IndexModel([("downloads", DESCENDING)], name="idx_downloads"),
+            IndexModel([("bundle_id", ASCENDING)], name="idx_bundle_id"),
         ]
     )
+
+    await ensure_dedup_index()
+
+    await _db["bundles"].create_indexes(
+        [
+            IndexModel([("key", ASCENDING)], unique=True, name="idx_bundle_key"),
+            IndexModel([("bundle_id", ASCENDING)], unique=True, name="idx_bundle_id"),
+        ]
+    )
+
+    await _db["pending_ingests"].create_indexes(
+        [
+            IndexModel(
+                [("chat_id", ASCENDING), ("message_id", ASCENDING)],
+                unique=True,
+                name="idx_pending_message",
+            )
+        ]
+    )
+
+    # Capped audit trail of file deliveries – old entries roll off automatically
+    try:
+        await _db.create_collection(
+            "deliveries", capped=True, size=DELIVERIES_CAP_BYTES
+        )
+        logger.info("Created capped 'deliveries' collection (%s bytes).", DELIVERIES_CAP_BYTES)
+    except CollectionInvalid:
+        pass  # already exists
+    await _db["deliveries"].create_indexes(
+        [IndexModel([("delivered_at", DESCENDING)], name="idx_delivered_at")]
+    )
     logger.info("MongoDB indexes verified.")
 
 
+async def ensure_dedup_index() -> bool:
+    """
+    Create the unique partial index that makes duplicate detection safe
+    against concurrent ingests (several sources, several handlers).
+
+    Returns False – and logs how to fix it – if existing documents violate
+    the constraint; lookups still work, only the race protection is missing.
+    """
+    try:
+        await get_db()["movies"].create_indexes(
+            [
+                IndexModel(
+                    [("dedup_key", ASCENDING), ("quality", ASCENDING), ("lang_key", ASCENDING)],
+                    unique=True,
+                    partialFilterExpression={"dedup_key": {"$type": "string"}},
+                    name="idx_dedup_unique",
+                )
+            ]
+        )
+        return True
+    except OperationFailure as exc:
+        if exc.code != _DUPLICATE_KEY:
+            raise
+        logger.error(
+            "Existing duplicates prevent the unique dedup index – "
+            "run `python -m shared.migrate_dedup_keys` to resolve them."
+        )
+        return False
+
+
 async def close_db() -> None:
     """Gracefully close the MongoDB connection."""
     if _client is not None:
@@ -72,7 +169,11 @@ async def close_db() -> None:
 async def insert_movie(document: dict) -> bool:
     """
     Insert a movie document.
-    Returns True on success, False if the document already exists.
+    Returns True on success, False on any other failure.
+
+    Raises DuplicateKeyError when an equivalent movie (same dedup_key,
+    quality and lang_key) was inserted concurrently – callers treat that
+    as a duplicate, not an error.
     """
     db = get_db()
     document["created_at"] = datetime.now(tz=timezone.utc)
@@ -80,25 +181,453 @@ async def insert_movie(document: dict) -> bool:
         await db["movies"].insert_one(document)
         logger.debug("Inserted movie: %s (%s)", document["cleaned_title"], document["quality"])
         return True
+    except DuplicateKeyError as exc:
+        if "dedup_key" in (exc.details or {}).get("keyPattern", {}):
+            raise
+        logger.warning("Insert failed (duplicate key): %s", exc)
+        return False
     except Exception as exc:
         logger.warning("Insert failed (likely duplicate): %s", exc)
         return False
 
 
-async def movie_exists(cleaned_title: str, quality: str) -> bool:
+def _dedup_key_filter(dedup_key: str) -> str | dict:
+    """
+    Match every stored key that describes the same title as *dedup_key*.
+
+    Keys carry a year only when it was in the filename, and backfilled
+    documents never do, so a key with a year also matches the yearless form:
+        "title|2021" → "title|2021" or "title"
+        "title"      → "title" only
+    A yearless key does not match keys with a year – "Dune.1080p" may be
+    either film, so it is posted rather than skipped (see movie_exists).
+    """
+    bare, _, year = dedup_key.partition("|")
+    if year:
+        return {"$in": [dedup_key, bare]}
+    return dedup_key
+
+
+async def movie_exists(dedup_key: str, quality: str, lang_key: str) -> bool:
     """
-    Duplicate protection: check whether a movie with the same title
-    and quality has already been stored.
+    Duplicate protection: check whether a movie with the same canonical
+    title key, quality and language set has already been stored.  Language
+    variants (e.g. Tamil and Hindi releases) are distinct movies.
+
+    A yearless key that only matches stored releases *with* a year is not
+    a duplicate; the near-match is logged so it can be reviewed.
+
+    Served entirely by the idx_dedup_unique index.
     """
     db = get_db()
     doc = await db["movies"].find_one(
-        {"cleaned_title": cleaned_title, "quality": quality},
+        {"dedup_key": _dedup_key_filter(dedup_key), "quality": quality, "lang_key": lang_key},
         projection={"_id": 1},
     )
-    return doc is not None
+    if doc is not None:
+        return True
+
+    if "|" not in dedup_key:
+        near = await db["movies"].find_one(
+            {
+                "dedup_key": re.compile("^" + re.escape(dedup_key + "|")),
+                "quality": quality,
+                "lang_key": lang_key,
+            },
+            projection={"_id": 0, "dedup_key": 1},
+        )
+        if near is not None:
+            logger.warning(
+                "Possible duplicate: '%s' has no year but '%s' is stored at %s – posting anyway.",
+                dedup_key,
+                near["dedup_key"],
+                quality,
+            )
+    return False
 
 
 async def get_movie_by_unique_id(unique_id: str) -> Optional[dict]:
     """Fetch a movie document by its unique_id."""
     db = get_db()
     return await db["movies"].find_one({"unique_id": unique_id})
+
+
+async def get_movies_by_bundle_id(bundle_id: str, limit: int = 50) -> list[dict]:
+    """Fetch every quality of a title in one query on idx_bundle_id."""
+    db = get_db()
+    cursor = db["movies"].find(
+        {"bundle_id": bundle_id},
+        projection={"unique_id": 1, "file_id": 1, "cleaned_title": 1, "quality": 1, "media_type": 1},
+    )
+    return await cursor.to_list(length=limit)
+
+
+async def _allocate_bundle(key: str | None, bundle_id: str | None = None) -> str:
+    """
+    Atomically get-or-create the ``bundles`` entry for *key* and return its
+    bundle_id.  Concurrent callers with the same key all receive the same
+    ID: the upsert on the unique ``key`` index has exactly one winner.
+
+    *bundle_id* proposes the ID to use if the entry is new (migrations reuse
+    existing IDs this way); otherwise a random one is generated.  A key of
+    None allocates a bundle of its own.
+    """
+    db = get_db()
+    for _ in range(10):
+        candidate = bundle_id or generate_unique_id()
+        try:
+            doc = await db["bundles"].find_one_and_update(
+                {"key": key if key is not None else f"#{candidate}"},
+                {"$setOnInsert": {"bundle_id": candidate, "created_at": datetime.now(tz=timezone.utc)}},
+                upsert=True,
+                projection={"_id": 0, "bundle_id": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            return doc["bundle_id"]
+        except DuplicateKeyError:
+            # Lost an upsert race (the next attempt finds the winner's entry)
+            # or the random bundle_id is taken (the next attempt draws anew).
+            bundle_id = None
+    raise RuntimeError("Could not allocate a bundle_id after 10 attempts.")
+
+
+def _bundle_key(dedup_key: str, lang_key: str) -> str:
+    return f"{dedup_key}#{lang_key}"
+
+
+async def _find_bundle_key(dedup_key: str, lang_key: str) -> str:
+    """
+    Pick the ``bundles`` key a title joins.  Only some filenames carry a
+    year (and backfilled keys never do), so year and no-year keys of one
+    title must share a bundle:
+        "title|2021" → its own bundle, else the yearless "title" one
+        "title"      → its own bundle, else the bundle of the only year
+                       stored for the title
+    Several years (remakes) are ambiguous; the yearless key then gets a
+    bundle of its own.  A new bundle uses the exact key.
+    """
+    bundles = get_db()["bundles"]
+    exact = _bundle_key(dedup_key, lang_key)
+    if await bundles.find_one({"key": exact}, projection={"_id": 1}):
+        return exact
+
+    bare, _, year = dedup_key.partition("|")
+    if year:
+        yearless = _bundle_key(bare, lang_key)
+        if await bundles.find_one({"key": yearless}, projection={"_id": 1}):
+            return yearless
+        return exact
+
+    pattern = re.compile(
+        "^" + re.escape(bare + "|") + r"\d{4}" + re.escape("#" + lang_key) + "$"
+    )
+    matches = await bundles.find({"key": pattern}, projection={"_id": 0, "key": 1}).to_list(length=2)
+    return matches[0]["key"] if len(matches) == 1 else exact
+
+
+async def resolve_bundle_id(dedup_key: str | None, lang_key: str) -> str:
+    """
+    Return the bundle_id shared by every quality of (*dedup_key*,
+    *lang_key*), creating it if this is the first quality stored.  Keys
+    with and without a year join one bundle (see _find_bundle_key).
+    Titles without a dedup key get a bundle of their own.
+    """
+    if dedup_key is None:
+        return await _allocate_bundle(None)
+    return await _allocate_bundle(await _find_bundle_key(dedup_key, lang_key))
+
+
+async def update_movie_imdb(unique_id: str, imdb: dict) -> None:
+    """Replace the IMDb data of an already stored movie (deferred enrichment)."""
+    db = get_db()
+    await db["movies"].update_one({"unique_id": unique_id}, {"$set": {"imdb": imdb}})
+
+
+# ── Ingest journal ─────────────────────────────────────────────────────────────
+
+async def add_pending_ingest(chat_id: int, message_id: int) -> None:
+    """
+    Journal a source-channel message before it is ingested (or when it is
+    rejected during shutdown).  Telegram does not resend channel updates,
+    so whatever is still journaled at the next start is fetched and
+    ingested again.  Idempotent.
+    """
+    db = get_db()
+    await db["pending_ingests"].update_one(
+        {"chat_id": chat_id, "message_id": message_id},
+        {"$setOnInsert": {"queued_at": datetime.now(tz=timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def remove_pending_ingest(chat_id: int, message_id: int) -> None:
+    """Clear a journal entry once its message has been handled."""
+    db = get_db()
+    await db["pending_ingests"].delete_one({"chat_id": chat_id, "message_id": message_id})
+
+
+async def get_pending_ingests(limit: int = 1000) -> list[dict]:
+    """Return journaled messages, oldest first."""
+    db = get_db()
+    cursor = (
+        db["pending_ingests"]
+        .find({}, projection={"_id": 0, "chat_id": 1, "message_id": 1})
+        .sort("queued_at", ASCENDING)
+        .limit(limit)
+    )
+    return await cursor.to_list(length=limit)
+
+
+# ── Delivery stats ─────────────────────────────────────────────────────────────
+
+async def increment_downloads(counts: dict[str, int]) -> dict[str, int]:
+    """
+    Apply buffered download counts with one unordered bulk ``$inc`` on
+    ``movies``.
+
+    Args:
+        counts : unique_id → number of deliveries to add.
+
+    Returns the counts that were *not* applied (empty on full success) so
+    only those are retried – re-sending applied ones would double count.
+    Raises if the outcome is unknown (e.g. a network error); the caller
+    retries the whole batch, which double counts if the server had in fact
+    applied it.  The counters are best-effort stats.
+    """
+    db = get_db()
+    now = datetime.now(tz=timezone.utc)
+    keys = list(counts)
+    try:
+        await db["movies"].bulk_write(
+            [
+                UpdateOne(
+                    {"unique_id": uid},
+                    {"$inc": {"downloads": counts[uid]}, "$set": {"last_downloaded_at": now}},
+                )
+                for uid in keys
+            ],
+            ordered=False,
+        )
+    except BulkWriteError as exc:
+        return {keys[err["index"]]: counts[keys[err["index"]]] for err in exc.details["writeErrors"]}
+    return {}
+
+
+async def insert_deliveries(events: list[dict]) -> list[dict]:
+    """
+    Insert buffered delivery events into the capped ``deliveries``
+    collection with one unordered bulk write.
+
+    Args:
+        events : dicts with keys unique_id, user_id, delivered_at.
+
+    Returns the events that were *not* stored (empty on full success).
+    Events keep the ``_id`` assigned on the first attempt, so a retried
+    event that did get stored fails with a duplicate key and counts as done.
+    Raises if the batch could not be sent at all.
+    """
+    db = get_db()
+    for event in events:
+        event.setdefault("_id", ObjectId())
+    try:
+        await db["deliveries"].bulk_write(
+            [InsertOne(event) for event in events],
+            ordered=False,
+        )
+    except BulkWriteError as exc:
+        return [
+            events[err["index"]]
+            for err in exc.details["writeErrors"]
+            if err.get("code") != _DUPLICATE_KEY
+        ]
+    return []
+
+
+async def top_downloads(limit: int) -> list[dict]:
+    """Return the *limit* most-downloaded movies of all time."""
+    db = get_db()
+    cursor = (
+        db["movies"]
+        .find(
+            {"downloads": {"$gt": 0}},
+            projection={"_id": 0, "unique_id": 1, "cleaned_title": 1, "quality": 1, "downloads": 1},
+        )
+        .sort("downloads", DESCENDING)
+        .limit(limit)
+    )
+    return await cursor.to_list(length=limit)
+
+
+async def top_recent_deliveries(limit: int, hours: int = 24) -> list[dict]:
+    """
+    Return the *limit* most-delivered movies within the last *hours*,
+    aggregated from the capped ``deliveries`` collection.
+    """
+    db = get_db()
+    since = datetime.now(tz=timezone.utc) - timedelta(hours=hours)
+    pipeline = [
+        {"$match": {"delivered_at": {"$gte": since}}},
+        {"$group": {"_id": "$unique_id", "downloads": {"$sum": 1}}},
+        {"$sort": {"downloads": -1}},
+        {"$limit": limit},
+        {
+            "$lookup": {
+                "from": "movies",
+                "localField": "_id",
+                "foreignField": "unique_id",
+                "as": "movie",
+                "pipeline": [{"$project": {"_id": 0, "cleaned_title": 1, "quality": 1}}],
+            }
+        },
+        {"$unwind": {"path": "$movie", "preserveNullAndEmptyArrays": True}},
+        {
+            "$project": {
+                "_id": 0,
+                "unique_id": "$_id",
+                "downloads": 1,
+                "cleaned_title": "$movie.cleaned_title",
+                "quality": "$movie.quality",
+            }
+        },
+    ]
+    return await db["deliveries"].aggregate(pipeline).to_list(length=limit)
+
+
+# ── Migrations ─────────────────────────────────────────────────────────────────
+
+async def backfill_dedup_keys(batch_size: int = 500) -> int:
+    """
+    Populate ``dedup_key`` and ``lang_key`` on documents stored before the
+    fields existed.
+
+    Ingest takes the year from the filename, which is not stored, so
+    backfilled keys carry no year; movie_exists() matches them against keys
+    with and without a year.  Titles without a usable key get
+    ``dedup_key: None`` so they are not rescanned.  ``lang_key`` comes from
+    the stored ``languages`` ("" for documents older than language routing).
+    Safe to re-run: only missing fields are written.
+    Returns the number of documents updated.
+    """
+    db = get_db()
+    cursor = db["movies"].find(
+        {"$or": [{"dedup_key": {"$exists": False}}, {"lang_key": {"$exists": False}}]},
+        projection={"cleaned_title": 1, "languages": 1, "dedup_key": 1, "lang_key": 1},
+    ).batch_size(batch_size)
+
+    updated = 0
+    ops: list[UpdateOne] = []
+    ids: list = []
+    async for doc in cursor:
+        fields = {}
+        if "dedup_key" not in doc:
+            fields["dedup_key"] = make_dedup_key(doc.get("cleaned_title", ""))
+        if "lang_key" not in doc:
+            fields["lang_key"] = make_lang_key(doc.get("languages") or [])
+        ids.append(doc["_id"])
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            updated += await _apply_key_backfill(ops, ids)
+            ops, ids = [], []
+            logger.info("Backfilled dedup_key on %s documents…", updated)
+    if ops:
+        updated += await _apply_key_backfill(ops, ids)
+
+    updated += await _release_duplicate_keys()
+    await ensure_dedup_index()
+
+    logger.info("dedup_key backfill complete: %s documents updated.", updated)
+    return updated
+
+
+async def _apply_key_backfill(ops: list[UpdateOne], ids: list) -> int:
+    """
+    Run one backfill batch (*ids* are the document _ids, in op order).
+    Documents whose new key collides with an existing movie are marked
+    ``duplicate`` with ``dedup_key: None``.
+    """
+    db = get_db()
+    try:
+        result = await db["movies"].bulk_write(ops, ordered=False)
+        return result.modified_count
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        if any(err.get("code") != _DUPLICATE_KEY for err in errors):
+            raise
+        conflicting = [ids[err["index"]] for err in errors]
+        await db["movies"].update_many(
+            {"_id": {"$in": conflicting}},
+            {"$set": {"dedup_key": None, "duplicate": True}},
+        )
+        logger.warning("Marked %s documents as duplicates of existing movies.", len(conflicting))
+        return exc.details.get("nModified", 0) + len(conflicting)
+
+
+async def _release_duplicate_keys() -> int:
+    """
+    Resolve key collisions left from before the unique index existed: the
+    oldest document of each (dedup_key, quality, lang_key) group keeps the
+    key, the others are marked ``duplicate`` with ``dedup_key: None``.
+    """
+    db = get_db()
+    pipeline = [
+        {"$match": {"dedup_key": {"$type": "string"}}},
+        {"$sort": {"created_at": 1}},
+        {
+            "$group": {
+                "_id": {"k": "$dedup_key", "q": "$quality", "l": "$lang_key"},
+                "ids": {"$push": "$_id"},
+            }
+        },
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    released = 0
+    async for group in db["movies"].aggregate(pipeline, allowDiskUse=True):
+        result = await db["movies"].update_many(
+            {"_id": {"$in": group["ids"][1:]}},
+            {"$set": {"dedup_key": None, "duplicate": True}},
+        )
+        released += result.modified_count
+    if released:
+        logger.warning("Marked %s documents with colliding keys as duplicates.", released)
+    return released
+
+
+async def backfill_bundle_ids() -> int:
+    """
+    Assign ``bundle_id`` to documents stored before bundles existed,
+    grouping them by (``dedup_key``, ``lang_key``) – run
+    backfill_dedup_keys first – and register every group in ``bundles``
+    so later ingests join the same bundle.  A group that already has a
+    bundle_id keeps it; other groups join a matching year / no-year bundle
+    the way ingest does (yearless keys sort first, so they are registered
+    before the keys with a year that join them).  Safe to re-run.
+    Returns the number of documents updated.
+    """
+    db = get_db()
+    pipeline = [
+        {"$match": {"dedup_key": {"$type": "string"}}},
+        {
+            "$group": {
+                "_id": {"k": "$dedup_key", "l": "$lang_key"},
+                "bundle_id": {"$max": "$bundle_id"},
+            }
+        },
+        {"$sort": {"_id.k": 1, "_id.l": 1}},
+    ]
+
+    updated = 0
+    async for group in db["movies"].aggregate(pipeline, allowDiskUse=True):
+        dedup_key, lang_key = group["_id"]["k"], group["_id"].get("l") or ""
+        if group.get("bundle_id"):
+            key = _bundle_key(dedup_key, lang_key)
+        else:
+            key = await _find_bundle_key(dedup_key, lang_key)
+        bundle_id = await _allocate_bundle(key, group.get("bundle_id"))
+        result = await db["movies"].update_many(
+            {"dedup_key": dedup_key, "lang_key": lang_key, "bundle_id": {"$exists": False}},
+            {"$set": {"bundle_id": bundle_id}},
+        )
+        updated += result.modified_count
+
+    logger.info("bundle_id backfill complete: %s documents updated.", updated)
+    return updated
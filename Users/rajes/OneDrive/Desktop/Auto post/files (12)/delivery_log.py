@@ -0,0 +1,182 @@
+"""
+delivery_log.py – Write-behind buffer for FileStoreBot delivery events.
+
+Every successful file delivery is recorded in memory only; a background
+task flushes the buffer to MongoDB in bulk (see database.increment_downloads
+and database.insert_deliveries) so the /start hot path never waits on an
+extra database write.
+
+The same task periodically recomputes the top-N lists served by /stats,
+so the command itself never queries MongoDB.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from .config import (
+    DELIVERY_BUFFER_MAX,
+    DELIVERY_FLUSH_INTERVAL,
+    STATS_TOP_N,
+    STATS_REFRESH_INTERVAL,
+)
+from .database import increment_downloads, insert_deliveries, top_downloads, top_recent_deliveries
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryLog:
+    """
+    Bounded in-memory buffer of delivery events with periodic bulk flush.
+
+    When the buffer is full the oldest events are dropped (and counted) –
+    losing a few stats is preferable to unbounded memory growth while
+    MongoDB is unreachable.
+    """
+
+    def __init__(
+        self,
+        max_events: int = DELIVERY_BUFFER_MAX,
+        flush_interval: float = DELIVERY_FLUSH_INTERVAL,
+        top_n: int = STATS_TOP_N,
+        stats_interval: float = STATS_REFRESH_INTERVAL,
+    ) -> None:
+        self._events: deque[dict] = deque(maxlen=max_events)
+        # Taken from _events but not yet written; each stage retries on its own
+        self._unapplied_counts: Counter = Counter()
+        self._uninserted: list[dict] = []
+        self._max_events = max_events
+        self._flush_interval = flush_interval
+        self._top_n = top_n
+        self._stats_interval = stats_interval
+
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats_refreshed_at = 0.0
+
+        self.dropped = 0
+        self.top_all_time: list[dict] = []
+        self.top_recent: list[dict] = []
+        self.stats_updated_at: Optional[datetime] = None
+
+    # ── Producer side (hot path, no I/O) ──────────────────────────────────────
+
+    def record(self, unique_id: str, user_id: int) -> None:
+        """Buffer one delivery; wakes the flusher early once the buffer is full."""
+        if len(self._events) >= self._max_events:
+            self.dropped += 1
+        self._events.append(
+            {
+                "unique_id": unique_id,
+                "user_id": user_id,
+                "delivered_at": datetime.now(tz=timezone.utc),
+            }
+        )
+        if len(self._events) >= self._max_events:
+            self._wakeup.set()
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        """Start the background flush loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="delivery-log-flusher")
+
+    async def stop(self) -> None:
+        """
+        Stop the flush loop and write out whatever is still buffered.
+
+        The loop is signalled rather than cancelled, so a flush that is in
+        progress completes instead of losing the batch it has taken.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+        if self.pending:
+            logger.warning("Delivery log stopped with %s events unwritten.", self.pending)
+        if self.dropped:
+            logger.warning("Delivery log dropped %s events (buffer full).", self.dropped)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            await self.flush()
+            if self._stopping:
+                break
+
+            if time.monotonic() - self._stats_refreshed_at >= self._stats_interval:
+                await self.refresh_stats()
+
+    # ── Consumer side ─────────────────────────────────────────────────────────
+
+    async def flush(self) -> None:
+        """
+        Drain the buffer into MongoDB.
+
+        The ``$inc`` counters and the audit-trail inserts are separate,
+        non-atomic writes, so each keeps its own retry state: whatever a
+        stage could not write (including the failed part of a partial bulk
+        write) stays pending for that stage only and is retried on the next
+        cycle.  Inserts are idempotent; a counter batch whose outcome is
+        unknown (network error) is retried whole and may double count.
+        """
+        async with self._flush_lock:
+            batch = list(self._events)
+            self._events.clear()
+            self._unapplied_counts.update(event["unique_id"] for event in batch)
+            self._uninserted.extend(batch)
+
+            overflow = len(self._uninserted) - self._max_events
+            if overflow > 0:
+                self.dropped += overflow
+                del self._uninserted[:overflow]
+
+            if self._unapplied_counts:
+                try:
+                    failed = await increment_downloads(dict(self._unapplied_counts))
+                    self._unapplied_counts = Counter(failed)
+                except Exception as exc:
+                    logger.error(
+                        "Download counter flush failed (%s movies): %s",
+                        len(self._unapplied_counts),
+                        exc,
+                    )
+
+            if self._uninserted:
+                try:
+                    self._uninserted = await insert_deliveries(self._uninserted)
+                except Exception as exc:
+                    logger.error(
+                        "Delivery trail flush failed (%s events): %s", len(self._uninserted), exc
+                    )
+
+            if batch:
+                logger.debug("Flushed %s deliveries.", len(batch))
+
+    async def refresh_stats(self) -> None:
+        """Recompute the top-N lists served by /stats."""
+        self._stats_refreshed_at = time.monotonic()
+        try:
+            self.top_all_time = await top_downloads(self._top_n)
+            self.top_recent = await top_recent_deliveries(self._top_n)
+            self.stats_updated_at = datetime.now(tz=timezone.utc)
+        except Exception as exc:
+            logger.error("Stats refresh failed: %s", exc)
+
+    @property
+    def pending(self) -> int:
+        """Number of events not yet written to the audit trail."""
+        return len(self._events) + len(self._uninserted)
@@ -1,16 +1,43 @@
 """
-imdb.py – Async OMDb API wrapper.
+imdb.py – Async movie-metadata lookup over a chain of providers.
 
 Returns a normalised dict so the rest of the codebase never touches
-raw OMDb response keys directly.
+raw provider response keys directly.
+
+Providers (configured via METADATA_PROVIDERS, in order):
+    omdb        – OMDb API
+    omdb-mirror – a second OMDb-compatible endpoint (OMDB_MIRROR_URL)
+    local       – offline title database file (LOCAL_TITLE_DB)
+
+fetch_imdb_data() races the chain: providers are started in order (staggered
+by METADATA_HEDGE_DELAY), the first good answer wins and the rest are
+cancelled.  Each provider has its own timeout, circuit breaker and latency
+stats, so one slow or failing provider does not hold up the others.
 """
 
+import asyncio
+import json
 import logging
-from typing import Optional
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Optional
 
 import aiohttp
 
-from .config import OMDB_API_KEY, OMDB_BASE_URL
+from .config import (
+    OMDB_API_KEY,
+    OMDB_BASE_URL,
+    OMDB_TIMEOUT,
+    OMDB_MIRROR_URL,
+    OMDB_MIRROR_API_KEY,
+    OMDB_MIRROR_TIMEOUT,
+    LOCAL_TITLE_DB,
+    METADATA_PROVIDERS,
+    METADATA_HEDGE_DELAY,
+    OMDB_BREAKER_THRESHOLD,
+    OMDB_BREAKER_COOLDOWN,
+)
+from .utils import make_dedup_key
 
 logger = logging.getLogger(__name__)
 
@@ -18,17 +45,312 @@ logger = logging.getLogger(__name__)
 # Internal sentinel for "not found / unavailable"
 _NA = "N/A"
 
+# Smoothing factor for the latency moving average
+_EWMA_ALPHA = 0.2
+
 
-def _clean_value(value: Optional[str]) -> str:
-    """Return the value as-is unless it is None, empty, or the OMDb 'N/A'."""
-    if not value or value.strip() == _NA:
+def _clean_value(value: Any) -> str:
+    """Return the value as a stripped string, or "N/A" if it is None, empty, or 'N/A'."""
+    if value is None:
         return _NA
-    return value.strip()
+    text = str(value).strip()
+    if not text or text == _NA:
+        return _NA
+    return text
+
+
+def empty_imdb_data(title: str) -> dict:
+    """Return the normalised dict with every field except *title* set to "N/A"."""
+    return {
+        "title": title,
+        "year": _NA,
+        "rating": _NA,
+        "genre": _NA,
+        "director": _NA,
+        "plot": _NA,
+        "poster": _NA,
+    }
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed    → calls allowed; *threshold* failures in a row open it.
+    open      → calls rejected for *cooldown* seconds.
+    half-open → one trial call allowed; success closes, failure re-opens.
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Return True if a call may be attempted now."""
+        if self._opened_at is None:
+            return True
+        if self._trial_in_flight or time.monotonic() - self._opened_at < self.cooldown:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("%s circuit closed – lookups resumed.", self.name)
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def abandon_trial(self) -> None:
+        """Forget a half-open trial that ended without a verdict (cancelled)."""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._opened_at is not None or self._failures >= self.threshold:
+            if self._opened_at is None:
+                logger.warning(
+                    "%s circuit opened after %s failures – skipping lookups for %.0fs.",
+                    self.name,
+                    self._failures,
+                    self.cooldown,
+                )
+            self._opened_at = time.monotonic()
+
+
+class ProviderStats:
+    """Per-provider call counters and latency (last + moving average)."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.last_latency_ms: Optional[float] = None
+        self.avg_latency_ms: Optional[float] = None
+
+    def observe(self, started: float) -> None:
+        latency = (time.monotonic() - started) * 1000
+        self.last_latency_ms = latency
+        if self.avg_latency_ms is None:
+            self.avg_latency_ms = latency
+        else:
+            self.avg_latency_ms += _EWMA_ALPHA * (latency - self.avg_latency_ms)
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+# ── Providers ──────────────────────────────────────────────────────────────────
+
+class MetadataProvider(ABC):
+    """
+    Base class for metadata sources.
+
+    Subclasses implement _fetch(title), returning the normalised dict on a
+    hit, None on a clean miss, and raising on failure.  lookup() adds the
+    timeout, circuit breaker and stats around it and never raises (except
+    CancelledError).
+    """
+
+    name = "provider"
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(self.name, OMDB_BREAKER_THRESHOLD, OMDB_BREAKER_COOLDOWN)
+        self.stats = ProviderStats()
+
+    @abstractmethod
+    async def _fetch(self, title: str) -> Optional[dict]:
+        """Return the normalised dict for *title*, None on a miss; raise on failure."""
+
+    async def lookup(self, title: str) -> Optional[dict]:
+        """Return normalised data for *title*, or None on miss / failure."""
+        if not self.breaker.allow():
+            self.stats.skipped += 1
+            logger.debug("%s circuit open – skipping lookup for '%s'", self.name, title)
+            return None
+
+        self.stats.calls += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._fetch(title), timeout=self.timeout)
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            self.breaker.abandon_trial()
+            raise
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            self.breaker.record_failure()
+            logger.warning("%s timed out after %.1fs for '%s'", self.name, self.timeout, title)
+            return None
+        except Exception as exc:
+            self.stats.failures += 1
+            self.breaker.record_failure()
+            logger.error("%s error for '%s': %s", self.name, title, exc)
+            return None
+
+        self.stats.observe(started)
+        self.breaker.record_success()
+        if result is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return result
+
+
+class OmdbProvider(MetadataProvider):
+    """OMDb API, or any endpoint speaking the same protocol."""
+
+    def __init__(self, name: str, base_url: str, api_key: str, timeout: float) -> None:
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        super().__init__(timeout)
+
+    async def _fetch(self, title: str) -> Optional[dict]:
+        params = {
+            "apikey": self.api_key,
+            "t": title,
+            "type": "movie",
+            "plot": "short",
+        }
 
+        async with aiohttp.ClientSession() as session:
+            async with session.get(self.base_url, params=params) as resp:
+                if resp.status != 200:
+                    raise RuntimeError(f"HTTP {resp.status}")
+                data = await resp.json(content_type=None)
+
+        if data.get("Response") != "True":
+            logger.info(
+                "%s: no results for '%s' (reason: %s)",
+                self.name,
+                title,
+                data.get("Error", "unknown"),
+            )
+            return None
+
+        return {
+            "title": _clean_value(data.get("Title")) or title,
+            "year": _clean_value(data.get("Year")),
+            "rating": _clean_value(data.get("imdbRating")),
+            "genre": _clean_value(data.get("Genre")),
+            "director": _clean_value(data.get("Director")),
+            "plot": _clean_value(data.get("Plot")),
+            "poster": _clean_value(data.get("Poster")),
+        }
+
+
+class LocalTitleProvider(MetadataProvider):
+    """
+    Offline title database loaded once from a JSON array or JSONL file.
+    Titles are matched on make_dedup_key(title), so casing, punctuation and
+    leading articles do not matter.
+    """
+
+    name = "local"
+
+    def __init__(self, path: str, timeout: float = 1.0) -> None:
+        super().__init__(timeout)
+        self._records: dict[str, dict] = {}
+        with open(path, encoding="utf-8") as fh:
+            text = fh.read()
+        rows = json.loads(text) if text.lstrip().startswith("[") else [
+            json.loads(line) for line in text.splitlines() if line.strip()
+        ]
+        for row in rows:
+            if not isinstance(row, dict) or not row.get("title"):
+                continue
+            key = make_dedup_key(str(row["title"]))
+            if key is None:
+                continue
+            record = {field: _clean_value(row.get(field)) for field in empty_imdb_data("")}
+            self._records.setdefault(key, record)
+        logger.info("Local title DB loaded: %s titles from %s", len(self._records), path)
+
+    async def _fetch(self, title: str) -> Optional[dict]:
+        key = make_dedup_key(title)
+        record = self._records.get(key) if key is not None else None
+        return dict(record) if record else None
+
+
+def _build_providers() -> list[MetadataProvider]:
+    """Instantiate the chain described by METADATA_PROVIDERS."""
+    providers: list[MetadataProvider] = []
+    for name in METADATA_PROVIDERS:
+        if name == "omdb":
+            providers.append(OmdbProvider("omdb", OMDB_BASE_URL, OMDB_API_KEY, OMDB_TIMEOUT))
+        elif name == "omdb-mirror" and OMDB_MIRROR_URL:
+            providers.append(
+                OmdbProvider("omdb-mirror", OMDB_MIRROR_URL, OMDB_MIRROR_API_KEY, OMDB_MIRROR_TIMEOUT)
+            )
+        elif name == "local" and LOCAL_TITLE_DB:
+            try:
+                providers.append(LocalTitleProvider(LOCAL_TITLE_DB))
+            except Exception as exc:
+                # A broken data file must not take the other providers down with it
+                logger.error("Could not load local title DB '%s': %s", LOCAL_TITLE_DB, exc)
+        else:
+            logger.warning("Metadata provider '%s' unknown or not configured – ignored.", name)
+    return providers
+
+
+_providers: Optional[list[MetadataProvider]] = None
+
+
+def init_providers() -> list[MetadataProvider]:
+    """
+    Build the provider chain from config.
+
+    Call once at startup, before the event loop is busy: loading the local
+    title DB reads and parses the whole file synchronously.
+    """
+    global _providers
+    _providers = _build_providers()
+    logger.info("Metadata providers: %s", ", ".join(p.name for p in _providers) or "none")
+    return _providers
+
+
+def get_providers() -> list[MetadataProvider]:
+    """Return the active provider chain (built from config if init_providers() was not called)."""
+    global _providers
+    if _providers is None:
+        _providers = _build_providers()
+    return _providers
+
+
+def set_providers(providers: list[MetadataProvider]) -> None:
+    """Replace the provider chain (e.g. with stubs pointing at a local server)."""
+    global _providers
+    _providers = list(providers)
+
+
+def provider_stats() -> dict[str, dict]:
+    """Return stats for every provider in the chain, keyed by name."""
+    return {
+        p.name: {**p.stats.as_dict(), "circuit_open": p.breaker.is_open}
+        for p in get_providers()
+    }
+
+
+# ── Public API ─────────────────────────────────────────────────────────────────
 
 async def fetch_imdb_data(title: str) -> dict:
     """
-    Query the OMDb API for *title* and return a normalised dict.
+    Look *title* up across the provider chain and return a normalised dict.
 
     Returned keys
     ─────────────
@@ -40,65 +362,57 @@ async def fetch_imdb_data(title: str) -> dict:
         plot     : str
         poster   : str  (URL or "N/A")
 
-    On any network / API error a dict full of "N/A" values is returned
-    so the caller can always proceed safely.
-    """
-    default = {
-        "title": title,
-        "year": _NA,
-        "rating": _NA,
-        "genre": _NA,
-        "director": _NA,
-        "plot": _NA,
-        "poster": _NA,
-    }
+    Providers start in chain order, METADATA_HEDGE_DELAY seconds apart; a
+    provider that misses or fails releases the next one immediately, even
+    while others are still running.  The first hit wins and the remaining
+    lookups are cancelled.
 
-    params = {
-        "apikey": OMDB_API_KEY,
-        "t": title,
-        "type": "movie",
-        "plot": "short",
-    }
+    If every provider misses or fails – or all circuits are open – a dict
+    full of "N/A" values is returned so the caller can always proceed safely.
+    """
+    providers = get_providers()
+    queue = list(providers)
+    pending: dict[asyncio.Task, MetadataProvider] = {}
+    result: Optional[dict] = None
+    winner: Optional[MetadataProvider] = None
+    # Misses / failures not yet answered by starting the next provider
+    released = 0
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                OMDB_BASE_URL,
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as resp:
-                if resp.status != 200:
-                    logger.warning(
-                        "OMDb returned HTTP %s for title='%s'", resp.status, title
-                    )
-                    return default
+        while result is None and (pending or queue):
+            if queue and (not pending or released or METADATA_HEDGE_DELAY <= 0):
+                released = max(released - 1, 0)
+                provider = queue.pop(0)
+                pending[asyncio.create_task(provider.lookup(title))] = provider
+                continue
 
-                data = await resp.json(content_type=None)
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=METADATA_HEDGE_DELAY if queue else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                # Hedge: the running providers are slow – start the next one
+                provider = queue.pop(0)
+                pending[asyncio.create_task(provider.lookup(title))] = provider
+                continue
 
-    except aiohttp.ClientError as exc:
-        logger.error("OMDb network error for '%s': %s", title, exc)
-        return default
-    except Exception as exc:
-        logger.error("Unexpected OMDb error for '%s': %s", title, exc)
-        return default
-
-    if data.get("Response") != "True":
-        logger.info(
-            "OMDb: no results for '%s' (reason: %s)",
-            title,
-            data.get("Error", "unknown"),
-        )
-        return default
-
-    result = {
-        "title": _clean_value(data.get("Title")) or title,
-        "year": _clean_value(data.get("Year")),
-        "rating": _clean_value(data.get("imdbRating")),
-        "genre": _clean_value(data.get("Genre")),
-        "director": _clean_value(data.get("Director")),
-        "plot": _clean_value(data.get("Plot")),
-        "poster": _clean_value(data.get("Poster")),
-    }
+            for task in done:
+                provider = pending.pop(task)
+                if task.result() is None:
+                    released += 1
+                elif result is None:
+                    result, winner = task.result(), provider
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if result is None:
+        return empty_imdb_data(title)
 
-    logger.debug("OMDb hit: %s (%s) – ★ %s", result["title"], result["year"], result["rating"])
+    logger.debug(
+        "%s hit: %s (%s) – ★ %s", winner.name, result["title"], result["year"], result["rating"]
+    )
     return result
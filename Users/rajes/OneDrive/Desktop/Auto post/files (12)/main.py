@@ -4,11 +4,21 @@ AutoPosterBot – main.py
 Entry point for the AutoPosterBot.
 
 Responsibilities:
-    • Watches the SOURCE_CHANNEL for new video / document messages.
-    • Cleans the filename → title, detects quality.
-    • Fetches IMDb metadata from OMDb.
-    • Stores the record in MongoDB (with duplicate protection).
-    • Posts an IMDb-poster + formatted caption to MAIN_CHANNEL.
+    • Watches every SOURCE_CHANNELS entry for new video / document messages.
+    • Cleans the filename → title, detects quality and audio languages.
+    • Fetches IMDb metadata from OMDb (once per file).  With a
+      METADATA_LATENCY_BUDGET the post goes out without waiting for a slow
+      lookup and is edited in the background once the data arrives.
+    • Stores the record in MongoDB (with duplicate protection), grouping all
+      qualities of a title under one bundle_id.
+    • Posts an IMDb-poster + formatted caption to every destination channel
+      resolved from CHANNEL_ROUTES (MAIN_CHANNEL by default), concurrently.
+
+On SIGTERM the bot stops accepting new files, lets in-flight ingests finish
+(up to SHUTDOWN_DRAIN_TIMEOUT seconds) and only then disconnects (within
+SHUTDOWN_STOP_TIMEOUT seconds, cancelling any handler still running).
+Every ingest is journaled in MongoDB until it completes; files that arrive
+during shutdown or whose ingest is cancelled are ingested on the next start.
 """
 
 import asyncio
@@ -22,11 +32,44 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from pyrogram import Client, filters, idle
 from pyrogram.types import Message, InputMediaPhoto
 from pyrogram.enums import ParseMode
-
-from shared.config import API_ID, API_HASH, AUTO_POSTER_BOT_TOKEN, SOURCE_CHANNEL, MAIN_CHANNEL
-from shared.database import init_db, close_db, insert_movie, movie_exists
-from shared.imdb import fetch_imdb_data
-from shared.utils import clean_title, extract_quality, generate_unique_id, build_deep_link, format_post_caption
+from pymongo.errors import DuplicateKeyError
+
+from shared.config import (
+    API_ID,
+    API_HASH,
+    AUTO_POSTER_BOT_TOKEN,
+    SOURCE_CHANNELS,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    SHUTDOWN_STOP_TIMEOUT,
+    METADATA_LATENCY_BUDGET,
+    PLACEHOLDER_POSTER_URL,
+)
+from shared.database import (
+    init_db,
+    close_db,
+    insert_movie,
+    movie_exists,
+    update_movie_imdb,
+    resolve_bundle_id,
+    add_pending_ingest,
+    remove_pending_ingest,
+    get_pending_ingests,
+)
+from shared.imdb import fetch_imdb_data, empty_imdb_data, init_providers, provider_stats
+from shared.tasks import TaskRegistry, stop_within
+from shared.utils import (
+    clean_title,
+    extract_quality,
+    extract_year,
+    detect_languages,
+    resolve_destinations,
+    make_dedup_key,
+    make_lang_key,
+    generate_unique_id,
+    build_deep_link,
+    build_bundle_link,
+    format_post_caption,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +81,8 @@ app = Client(
     bot_token=AUTO_POSTER_BOT_TOKEN,
 )
 
+registry = TaskRegistry()
+
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
@@ -61,48 +106,207 @@ def _get_file_id(message: Message) -> str | None:
     return media.file_id if media else None
 
 
-async def _post_to_main_channel(
+async def _post_to_channel(
     client: Client,
+    chat_id: int,
     poster_url: str,
     caption: str,
-) -> None:
+) -> Message:
     """
-    Send the movie post to MAIN_CHANNEL.
+    Send the movie post to *chat_id* and return the sent message.
 
     • If a valid poster URL is available → send as photo with caption.
     • Otherwise → send as text message.
     """
     if poster_url and poster_url != "N/A":
         try:
-            await client.send_photo(
-                chat_id=MAIN_CHANNEL,
+            return await client.send_photo(
+                chat_id=chat_id,
                 photo=poster_url,
                 caption=caption,
                 parse_mode=ParseMode.HTML,
             )
-            return
         except Exception as exc:
             logger.warning("Poster send failed (%s), falling back to text post.", exc)
 
-    await client.send_message(
-        chat_id=MAIN_CHANNEL,
+    return await client.send_message(
+        chat_id=chat_id,
         text=caption,
         parse_mode=ParseMode.HTML,
         disable_web_page_preview=False,
     )
 
 
+async def _post_to_destinations(
+    client: Client,
+    destinations: list[int],
+    poster_url: str,
+    caption: str,
+) -> list[Message]:
+    """
+    Post to all *destinations* concurrently.  A failure in one channel does
+    not affect the others.  Returns the successfully sent messages.
+    """
+    results = await asyncio.gather(
+        *(_post_to_channel(client, chat_id, poster_url, caption) for chat_id in destinations),
+        return_exceptions=True,
+    )
+    posted: list[Message] = []
+    for chat_id, result in zip(destinations, results):
+        if isinstance(result, BaseException):
+            logger.error("Post to channel %s failed: %s", chat_id, result)
+        else:
+            posted.append(result)
+    return posted
+
+
+async def _edit_post(client: Client, post: Message, poster_url: str, caption: str) -> None:
+    """
+    Update an already published post with the final caption and poster.
+
+    Photo posts get their image swapped when a real poster is available;
+    text posts can only have their text edited.
+    """
+    has_poster = bool(poster_url) and poster_url != "N/A"
+
+    if post.photo and has_poster:
+        try:
+            await client.edit_message_media(
+                chat_id=post.chat.id,
+                message_id=post.id,
+                media=InputMediaPhoto(poster_url, caption=caption, parse_mode=ParseMode.HTML),
+            )
+            return
+        except Exception as exc:
+            logger.warning("Poster edit failed (%s), editing caption only.", exc)
+
+    if post.photo:
+        await client.edit_message_caption(
+            chat_id=post.chat.id,
+            message_id=post.id,
+            caption=caption,
+            parse_mode=ParseMode.HTML,
+        )
+    else:
+        await client.edit_message_text(
+            chat_id=post.chat.id,
+            message_id=post.id,
+            text=caption,
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=False,
+        )
+
+
+async def _finish_enrichment(
+    client: Client,
+    lookup: asyncio.Task,
+    unique_id: str,
+    cleaned: str,
+    quality: str,
+    deep_link: str,
+    bundle_link: str,
+    posts: list[Message],
+) -> None:
+    """
+    Background half of a deferred post: wait for the IMDb lookup, store the
+    result and edit every published post with the full caption and poster.
+    The caller cancels *lookup* when this task ends, however it ends.
+    """
+    imdb_data = await lookup
+
+    if imdb_data == empty_imdb_data(cleaned):
+        logger.info("Deferred lookup for '%s' found nothing – post left as is.", cleaned)
+        return
+
+    await update_movie_imdb(unique_id, imdb_data)
+
+    caption = format_post_caption(cleaned, quality, deep_link, imdb_data, bundle_link)
+    poster_url = imdb_data.get("poster", "N/A")
+    results = await asyncio.gather(
+        *(_edit_post(client, post, poster_url, caption) for post in posts),
+        return_exceptions=True,
+    )
+    for post, result in zip(posts, results):
+        if isinstance(result, BaseException):
+            logger.error("Edit of post %s in %s failed: %s", post.id, post.chat.id, result)
+
+    logger.info("Enriched '%s' (%s) after posting.", cleaned, quality)
+
+
+async def _reject_during_shutdown(client: Client, message: Message) -> None:
+    """Journal files that arrive after shutdown began; the next start ingests them."""
+    await add_pending_ingest(message.chat.id, message.id)
+    logger.warning(
+        "Shutting down – file '%s' (chat %s, message %s) queued for the next start.",
+        _get_filename(message),
+        message.chat.id,
+        message.id,
+    )
+
+
+async def _ingest_journaled(client: Client, message: Message) -> None:
+    """
+    Run _ingest() with the message journaled in ``pending_ingests``, so an
+    ingest cancelled at shutdown (or cut off by a crash) is retried on the
+    next start by _replay_pending_ingests().
+    """
+    await add_pending_ingest(message.chat.id, message.id)
+    try:
+        await _ingest(client, message)
+    except asyncio.CancelledError:
+        # Stays journaled – ingested again on the next start
+        raise
+    except Exception:
+        await remove_pending_ingest(message.chat.id, message.id)
+        raise
+    await remove_pending_ingest(message.chat.id, message.id)
+
+
+async def _replay_pending_ingests(client: Client) -> None:
+    """
+    Ingest the files a previous run journaled but never finished: those
+    rejected during its shutdown and those whose ingest was cancelled.
+    """
+    entries = await get_pending_ingests()
+    if entries:
+        logger.info("Replaying %s file(s) left over from the previous run…", len(entries))
+
+    for entry in entries:
+        chat_id, message_id = entry["chat_id"], entry["message_id"]
+        try:
+            message = await client.get_messages(chat_id, message_id)
+        except Exception as exc:
+            logger.error("Could not fetch message %s in %s for replay: %s", message_id, chat_id, exc)
+            continue
+
+        if message is None or message.empty or _get_media(message) is None:
+            logger.info("Journaled message %s in %s no longer exists – dropped.", message_id, chat_id)
+            await remove_pending_ingest(chat_id, message_id)
+            continue
+
+        try:
+            await _ingest_journaled(client, message)
+        except Exception as exc:
+            logger.error("Replay of message %s in %s failed: %s", message_id, chat_id, exc)
+
+
 # ── Handler ────────────────────────────────────────────────────────────────────
 
 @app.on_message(
-    filters.chat(SOURCE_CHANNEL)
+    filters.chat(SOURCE_CHANNELS)
     & (filters.video | filters.document)
 )
+@registry.tracked(on_reject=_reject_during_shutdown)
 async def handle_new_file(client: Client, message: Message) -> None:
     """
-    Core handler: called whenever a video or document is posted to
-    SOURCE_CHANNEL.
+    Core handler: called whenever a video or document is posted to one of
+    the SOURCE_CHANNELS.
     """
+    await _ingest_journaled(client, message)
+
+
+async def _ingest(client: Client, message: Message) -> None:
+    """Clean, deduplicate, enrich, store and post one source-channel file."""
     filename = _get_filename(message)
     file_id = _get_file_id(message)
 
@@ -115,16 +319,42 @@ async def handle_new_file(client: Client, message: Message) -> None:
     # ── Step 1: Extract metadata from filename ─────────────────────────────
     quality = extract_quality(filename)
     cleaned = clean_title(filename)
+    dedup_key = make_dedup_key(cleaned, extract_year(filename))
+    languages = detect_languages(filename)
+    lang_key = make_lang_key(languages)
 
-    logger.info("Cleaned title='%s'  quality='%s'", cleaned, quality)
+    logger.info(
+        "Cleaned title='%s'  quality='%s'  key='%s'  languages=%s",
+        cleaned, quality, dedup_key, languages,
+    )
 
     # ── Step 2: Duplicate protection ───────────────────────────────────────
-    if await movie_exists(cleaned, quality):
-        logger.info("Duplicate detected – '%s' (%s) already in DB. Skipping.", cleaned, quality)
+    if dedup_key is None:
+        logger.warning("No usable dedup key for '%s' – duplicate check skipped.", filename)
+    elif await movie_exists(dedup_key, quality, lang_key):
+        logger.info(
+            "Duplicate detected – '%s' (%s, %s) already in DB. Skipping.",
+            cleaned, quality, lang_key or "no language tag",
+        )
         return
 
-    # ── Step 3: IMDb data ──────────────────────────────────────────────────
-    imdb_data = await fetch_imdb_data(cleaned)
+    # ── Step 3: IMDb data (bounded by the latency budget, if any) ──────────
+    lookup = asyncio.create_task(fetch_imdb_data(cleaned))
+    if METADATA_LATENCY_BUDGET > 0:
+        await asyncio.wait({lookup}, timeout=METADATA_LATENCY_BUDGET)
+    else:
+        await asyncio.wait({lookup})
+
+    deferred = not lookup.done()
+    if deferred:
+        logger.info(
+            "OMDb slower than %.1fs for '%s' – posting now, enriching later.",
+            METADATA_LATENCY_BUDGET,
+            cleaned,
+        )
+        imdb_data = empty_imdb_data(cleaned)
+    else:
+        imdb_data = lookup.result()
 
     # ── Step 4: Generate unique ID & persist ───────────────────────────────
     unique_id = generate_unique_id()
@@ -137,40 +367,85 @@ async def handle_new_file(client: Client, message: Message) -> None:
         attempts += 1
         if attempts > 10:
             logger.error("Could not generate a unique ID after 10 attempts. Aborting.")
+            lookup.cancel()
             return
 
+    # Every quality of the same title shares one bundle_id
+    bundle_id = await resolve_bundle_id(dedup_key, lang_key)
+
     document = {
         "unique_id": unique_id,
+        "bundle_id": bundle_id,
         "file_id": file_id,
+        "media_type": "video" if message.video else "document",
         "cleaned_title": cleaned,
+        "dedup_key": dedup_key,
         "quality": quality,
+        "languages": languages,
+        "lang_key": lang_key,
         "imdb": imdb_data,
     }
 
-    success = await insert_movie(document)
+    try:
+        success = await insert_movie(document)
+    except DuplicateKeyError:
+        logger.info(
+            "Duplicate detected – '%s' (%s) was stored concurrently. Skipping.", cleaned, quality
+        )
+        lookup.cancel()
+        return
     if not success:
         logger.error("DB insert failed for '%s' – aborting post.", cleaned)
+        lookup.cancel()
         return
 
     logger.info("Stored movie with unique_id='%s'", unique_id)
 
     # ── Step 5: Build caption & post ──────────────────────────────────────
     deep_link = build_deep_link(unique_id)
-    caption = format_post_caption(cleaned, quality, deep_link, imdb_data)
+    bundle_link = build_bundle_link(bundle_id)
+    caption = format_post_caption(cleaned, quality, deep_link, imdb_data, bundle_link)
 
-    await _post_to_main_channel(client, imdb_data.get("poster", "N/A"), caption)
-    logger.info("Posted '%s' (%s) to main channel.", cleaned, quality)
+    poster_url = imdb_data.get("poster", "N/A")
+    if deferred and PLACEHOLDER_POSTER_URL:
+        poster_url = PLACEHOLDER_POSTER_URL
+
+    destinations = resolve_destinations(languages)
+    posts = await _post_to_destinations(client, destinations, poster_url, caption)
+    logger.info(
+        "Posted '%s' (%s) to %s/%s channels.", cleaned, quality, len(posts), len(destinations)
+    )
+
+    if deferred:
+        enrichment = registry.spawn(
+            _finish_enrichment(
+                client, lookup, unique_id, cleaned, quality, deep_link, bundle_link, posts
+            ),
+            name=f"enrich-{unique_id}",
+        )
+        # Also covers a task cancelled by drain() before it ever started
+        enrichment.add_done_callback(lambda _: lookup.cancel())
 
 
 # ── Lifecycle ──────────────────────────────────────────────────────────────────
 
 async def main() -> None:
     await init_db()
+    init_providers()
     await app.start()
     logger.info("AutoPosterBot is running…")
+    registry.spawn(_replay_pending_ingests(app), name="replay-ingests")
     await idle()
-    await app.stop()
-    await close_db()
+
+    logger.info("Shutdown requested – draining in-flight work…")
+    registry.close()
+    try:
+        await registry.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        await stop_within(app.stop(), SHUTDOWN_STOP_TIMEOUT, "Client stop")
+    finally:
+        await close_db()
+        for name, stats in provider_stats().items():
+            logger.info("Metadata provider %s: %s", name, stats)
 
 
 if __name__ == "__main__":
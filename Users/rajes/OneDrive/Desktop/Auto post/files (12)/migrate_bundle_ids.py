@@ -0,0 +1,27 @@
+"""
+migrate_bundle_ids.py – One-off migration: backfill movies.bundle_id.
+
+Usage (from the project root):
+    python -m shared.migrate_bundle_ids
+
+Bundles are grouped by dedup_key, so missing dedup_keys are backfilled
+first.  Idempotent; documents that already carry a bundle_id are left
+untouched.
+"""
+
+import asyncio
+
+from .database import init_db, close_db, backfill_dedup_keys, backfill_bundle_ids
+
+
+async def main() -> None:
+    await init_db()
+    try:
+        await backfill_dedup_keys()
+        await backfill_bundle_ids()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
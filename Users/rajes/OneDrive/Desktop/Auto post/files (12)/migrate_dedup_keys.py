@@ -0,0 +1,28 @@
+"""
+migrate_dedup_keys.py – One-off migration: backfill movies.dedup_key and
+movies.lang_key.
+
+Usage (from the project root):
+    python -m shared.migrate_dedup_keys
+
+Documents whose key collides with an older movie are marked
+``duplicate: true`` and keep ``dedup_key: None``, after which the unique
+dedup index is created.  Idempotent; fields that are already set are left
+untouched.
+"""
+
+import asyncio
+
+from .database import init_db, close_db, backfill_dedup_keys
+
+
+async def main() -> None:
+    await init_db()
+    try:
+        await backfill_dedup_keys()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
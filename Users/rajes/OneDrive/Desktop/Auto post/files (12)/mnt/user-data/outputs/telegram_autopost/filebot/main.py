@@ -7,6 +7,18 @@ Responsibilities:
     • /start                → welcome message
     • /start <unique_id>    → look up file_id in MongoDB and send the file
                               privately to the requesting user
+    • /start all_<bundle_id> → send every quality of a title in one
+                              media group (one indexed query, one API call
+                              per media type)
+    • /stats (admins only)  → precomputed top-N download lists
+
+Deliveries are recorded through a write-behind buffer (shared.delivery_log)
+that is flushed to MongoDB in bulk, off the /start hot path.
+
+On SIGTERM the bot stops accepting new commands, lets in-flight deliveries
+finish (up to SHUTDOWN_DRAIN_TIMEOUT seconds), stops the client (up to
+SHUTDOWN_STOP_TIMEOUT seconds, cancelling any delivery still running),
+flushes the delivery buffer and only then closes the database.
 """
 
 import asyncio
@@ -17,12 +29,24 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from pyrogram import Client, filters, idle
-from pyrogram.types import Message
+from pyrogram.types import Message, InputMediaVideo, InputMediaDocument
 from pyrogram.enums import ParseMode
 from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated
-
-from shared.config import API_ID, API_HASH, FILE_STORE_BOT_TOKEN
-from shared.database import init_db, close_db, get_movie_by_unique_id
+from pyrogram.file_id import FileId, FileType
+
+from shared.config import (
+    API_ID,
+    API_HASH,
+    FILE_STORE_BOT_TOKEN,
+    ADMIN_IDS,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    SHUTDOWN_STOP_TIMEOUT,
+    UNIQUE_ID_LENGTH,
+)
+from shared.database import init_db, close_db, get_movie_by_unique_id, get_movies_by_bundle_id
+from shared.utils import BUNDLE_PREFIX
+from shared.delivery_log import DeliveryLog
+from shared.tasks import TaskRegistry, stop_within
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +58,13 @@ app = Client(
     bot_token=FILE_STORE_BOT_TOKEN,
 )
 
+delivery_log = DeliveryLog()
+registry = TaskRegistry()
+
+# Bundle delivery order (best quality first) and Telegram's album size limit
+_QUALITY_ORDER = {"4K": 0, "1080p": 1, "720p": 2, "480p": 3, "HD": 4}
+_MEDIA_GROUP_MAX = 10
+
 # ── Message templates ──────────────────────────────────────────────────────────
 
 _WELCOME_TEXT = (
@@ -50,24 +81,54 @@ _NOT_FOUND_TEXT = (
 
 _SENDING_TEXT = "⏳ Fetching your file, please wait…"
 
+_SENDING_BUNDLE_TEXT = "⏳ Fetching {count} files, please wait…"
+
 _ERROR_TEXT = (
     "⚠️ <b>Delivery Error</b>\n\n"
     "Something went wrong while sending your file.\n"
     "Please try again in a moment."
 )
 
+_STATS_PENDING_TEXT = "📊 Stats are still being computed – try again shortly."
+
+_RESTARTING_TEXT = (
+    "🔄 <b>Restarting</b>\n\n"
+    "The bot is restarting for maintenance.\n"
+    "Please tap the link again in a few seconds."
+)
+
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
+def _file_caption(movie: dict) -> str:
+    """Caption attached to every delivered file."""
+    title = movie.get("cleaned_title", "Movie")
+    quality = movie.get("quality", "")
+    return f"🎬 <b>{title}</b>  [{quality}]"
+
+
+def _media_type(movie: dict) -> str:
+    """
+    Return "video" or "document" for a stored movie.  Older documents have
+    no media_type field, so it is read from the file_id itself.
+    """
+    media_type = movie.get("media_type")
+    if media_type:
+        return media_type
+    try:
+        file_type = FileId.decode(movie["file_id"]).file_type
+    except Exception:
+        return "document"
+    return "video" if file_type == FileType.VIDEO else "document"
+
+
 async def _send_file(client: Client, chat_id: int, file_id: str, movie: dict) -> None:
     """
     Forward the stored file to *chat_id* using its cached file_id.
     Handles both video and document types transparently – Telegram
     infers the media type from the file_id.
     """
-    title = movie.get("cleaned_title", "Movie")
-    quality = movie.get("quality", "")
-    caption = f"🎬 <b>{title}</b>  [{quality}]"
+    caption = _file_caption(movie)
 
     try:
         # Try sending as video first; fall back to document on failure.
@@ -86,14 +147,69 @@ async def _send_file(client: Client, chat_id: int, file_id: str, movie: dict) ->
         )
 
 
+def _bundle_chunks(movies: list[dict]) -> list[list[dict]]:
+    """
+    Split a bundle into the messages it is delivered as.
+
+    Telegram albums cannot mix videos and documents, so files are grouped by
+    media type and cut into chunks of up to 10 – normally a single album.
+    """
+    groups: dict[str, list[dict]] = {}
+    for movie in movies:
+        groups.setdefault(_media_type(movie), []).append(movie)
+
+    return [
+        items[start:start + _MEDIA_GROUP_MAX]
+        for items in groups.values()
+        for start in range(0, len(items), _MEDIA_GROUP_MAX)
+    ]
+
+
+async def _send_chunk(client: Client, chat_id: int, chunk: list[dict]) -> None:
+    """Send one chunk from _bundle_chunks(): an album, or _send_file() for a lone file."""
+    if len(chunk) == 1:
+        await _send_file(client, chat_id, chunk[0]["file_id"], chunk[0])
+        return
+    media_cls = InputMediaVideo if _media_type(chunk[0]) == "video" else InputMediaDocument
+    await client.send_media_group(
+        chat_id=chat_id,
+        media=[
+            media_cls(movie["file_id"], caption=_file_caption(movie), parse_mode=ParseMode.HTML)
+            for movie in chunk
+        ],
+    )
+
+
+def _format_top_list(heading: str, rows: list[dict]) -> str:
+    """Render one top-N list for /stats."""
+    if not rows:
+        return f"<b>{heading}</b>\n<i>No downloads yet.</i>"
+    lines = [
+        f"{i}. {row.get('cleaned_title') or row['unique_id']} "
+        f"[{row.get('quality') or '?'}] – {row['downloads']}"
+        for i, row in enumerate(rows, start=1)
+    ]
+    return f"<b>{heading}</b>\n" + "\n".join(lines)
+
+
+async def _reply_restarting(client: Client, message: Message) -> None:
+    """Tell users whose command arrived during shutdown to retry."""
+    try:
+        await message.reply_text(_RESTARTING_TEXT, parse_mode=ParseMode.HTML)
+    except Exception:
+        pass
+
+
 # ── /start handler ─────────────────────────────────────────────────────────────
 
 @app.on_message(filters.private & filters.command("start"))
+@registry.tracked(on_reject=_reply_restarting)
 async def handle_start(client: Client, message: Message) -> None:
     """
     Dispatch /start commands:
         /start           → welcome message
         /start <uid>     → deliver file identified by <uid>
+        /start all_<bid> → deliver every quality in bundle <bid>
     """
     parts = message.text.split(maxsplit=1)
 
@@ -107,6 +223,10 @@ async def handle_start(client: Client, message: Message) -> None:
 
     unique_id = parts[1].strip()
 
+    if unique_id.startswith(BUNDLE_PREFIX):
+        await _handle_bundle(client, message, unique_id[len(BUNDLE_PREFIX):])
+        return
+
     # ── Validate ID format (must be alphanumeric, exactly UNIQUE_ID_LENGTH) ──
     if not unique_id.isalnum() or len(unique_id) != 8:
         await message.reply_text(_NOT_FOUND_TEXT, parse_mode=ParseMode.HTML)
@@ -125,6 +245,7 @@ async def handle_start(client: Client, message: Message) -> None:
 
     try:
         await _send_file(client, message.chat.id, movie["file_id"], movie)
+        delivery_log.record(unique_id, message.from_user.id)
         await ack.delete()
 
         logger.info(
@@ -138,6 +259,7 @@ async def handle_start(client: Client, message: Message) -> None:
         logger.warning("FloodWait: sleeping %s seconds.", exc.value)
         await asyncio.sleep(exc.value)
         await _send_file(client, message.chat.id, movie["file_id"], movie)
+        delivery_log.record(unique_id, message.from_user.id)
         await ack.delete()
 
     except (UserIsBlocked, InputUserDeactivated) as exc:
@@ -157,15 +279,98 @@ async def handle_start(client: Client, message: Message) -> None:
             pass
 
 
+async def _handle_bundle(client: Client, message: Message, bundle_id: str) -> None:
+    """Deliver every quality of one title: one DB query, one ack, one album."""
+    if not bundle_id.isalnum() or len(bundle_id) != UNIQUE_ID_LENGTH:
+        await message.reply_text(_NOT_FOUND_TEXT, parse_mode=ParseMode.HTML)
+        return
+
+    movies = await get_movies_by_bundle_id(bundle_id)
+
+    if not movies:
+        logger.info("Unknown bundle_id='%s' requested by user %s", bundle_id, message.from_user.id)
+        await message.reply_text(_NOT_FOUND_TEXT, parse_mode=ParseMode.HTML)
+        return
+
+    movies.sort(key=lambda m: _QUALITY_ORDER.get(m.get("quality"), len(_QUALITY_ORDER)))
+    ack = await message.reply_text(_SENDING_BUNDLE_TEXT.format(count=len(movies)))
+
+    try:
+        # Chunks go out one by one; a FloodWait retries only the chunk that
+        # hit it, so albums already delivered are never sent twice.
+        for chunk in _bundle_chunks(movies):
+            try:
+                await _send_chunk(client, message.chat.id, chunk)
+            except FloodWait as exc:
+                logger.warning("FloodWait: sleeping %s seconds.", exc.value)
+                await asyncio.sleep(exc.value)
+                await _send_chunk(client, message.chat.id, chunk)
+
+            for movie in chunk:
+                delivery_log.record(movie["unique_id"], message.from_user.id)
+        await ack.delete()
+
+        logger.info(
+            "Bundle '%s' (%s files) delivered to user %s",
+            movies[0].get("cleaned_title"),
+            len(movies),
+            message.from_user.id,
+        )
+
+    except (UserIsBlocked, InputUserDeactivated) as exc:
+        logger.warning("Cannot deliver to user %s: %s", message.from_user.id, exc)
+
+    except Exception as exc:
+        logger.error(
+            "Unexpected error delivering bundle '%s' to user %s: %s",
+            bundle_id,
+            message.from_user.id,
+            exc,
+        )
+        try:
+            await ack.edit_text(_ERROR_TEXT, parse_mode=ParseMode.HTML)
+        except Exception:
+            pass
+
+
+# ── /stats handler (admins only) ───────────────────────────────────────────────
+
+@app.on_message(filters.private & filters.command("stats") & filters.user(ADMIN_IDS))
+@registry.tracked(on_reject=_reply_restarting)
+async def handle_stats(client: Client, message: Message) -> None:
+    """Serve the precomputed top-N lists – no database query on this path."""
+    if delivery_log.stats_updated_at is None:
+        await message.reply_text(_STATS_PENDING_TEXT)
+        return
+
+    text = (
+        _format_top_list("🔥 Top downloads (24h)", delivery_log.top_recent)
+        + "\n\n"
+        + _format_top_list("🏆 Top downloads (all time)", delivery_log.top_all_time)
+        + f"\n\n<i>Updated {delivery_log.stats_updated_at:%Y-%m-%d %H:%M} UTC"
+        f" · {delivery_log.pending} pending</i>"
+    )
+    await message.reply_text(text, parse_mode=ParseMode.HTML)
+
+
 # ── Lifecycle ──────────────────────────────────────────────────────────────────
 
 async def main() -> None:
     await init_db()
+    delivery_log.start()
     await app.start()
     logger.info("FileStoreBot is running…")
     await idle()
-    await app.stop()
-    await close_db()
+
+    logger.info("Shutdown requested – draining in-flight deliveries…")
+    registry.close()
+    try:
+        await registry.drain(SHUTDOWN_DRAIN_TIMEOUT)
+        await stop_within(app.stop(), SHUTDOWN_STOP_TIMEOUT, "Client stop")
+    finally:
+        # Flushed whether or not the client stopped cleanly
+        await delivery_log.stop()
+        await close_db()
 
 
 if __name__ == "__main__":
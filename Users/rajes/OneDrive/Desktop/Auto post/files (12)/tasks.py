@@ -0,0 +1,174 @@
+"""
+tasks.py – Concurrency-limited registry of in-flight work, used by both
+bots for graceful shutdown.
+
+Handlers are wrapped with ``registry.tracked()`` and background jobs are
+started with ``registry.spawn()``.  On shutdown the entry point calls
+``close()`` (new updates are rejected) and then ``drain()``, which waits for
+in-flight work up to a deadline and cancels whatever is left.  The client
+itself is then stopped through ``stop_within()``, which bounds that step too.
+"""
+
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Coroutine, Optional
+
+from .config import MAX_INFLIGHT_TASKS
+
+logger = logging.getLogger(__name__)
+
+
+class TaskRegistry:
+    """
+    Tracks in-flight handler calls and background tasks.
+
+    At most *max_concurrency* units of work run at once; the rest wait on
+    the semaphore.  Handler calls are counted rather than stored because
+    Pyrogram runs them inside long-lived dispatcher worker tasks that must
+    not be cancelled from here.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_INFLIGHT_TASKS) -> None:
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._accepting = True
+
+    # ── State ─────────────────────────────────────────────────────────────────
+
+    @property
+    def accepting(self) -> bool:
+        """False once close() has been called."""
+        return self._accepting
+
+    @property
+    def inflight(self) -> int:
+        """Number of handler calls and background tasks not yet finished."""
+        return self._inflight
+
+    def _enter(self) -> None:
+        self._inflight += 1
+        self._idle.clear()
+
+    def _exit(self) -> None:
+        self._inflight -= 1
+        if self._inflight == 0:
+            self._idle.set()
+
+    # ── Registration ──────────────────────────────────────────────────────────
+
+    def tracked(
+        self,
+        on_reject: Optional[Callable[..., Awaitable[Any]]] = None,
+    ) -> Callable:
+        """
+        Decorator for Pyrogram handlers.
+
+        While the registry is accepting, the handler runs under the
+        concurrency limit and counts as in-flight work.  After close() the
+        handler is skipped and *on_reject* (called with the handler's
+        arguments) runs instead, if given.
+        """
+
+        def decorator(handler: Callable[..., Coroutine]) -> Callable[..., Coroutine]:
+            @functools.wraps(handler)
+            async def wrapper(*args, **kwargs):
+                if not self._accepting:
+                    if on_reject is not None:
+                        await on_reject(*args, **kwargs)
+                    return None
+
+                self._enter()
+                try:
+                    async with self._semaphore:
+                        return await handler(*args, **kwargs)
+                finally:
+                    self._exit()
+
+            return wrapper
+
+        return decorator
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        """
+        Run *coro* as a background task under the concurrency limit.
+        The task is cancelled if it is still running when drain() times out.
+
+        A task cancelled while still waiting for the semaphore never runs
+        *coro* at all – clean-up that must happen regardless belongs in a
+        done callback on the returned task, not in *coro*.
+        """
+        self._enter()
+
+        async def runner():
+            async with self._semaphore:
+                return await coro
+
+        task = asyncio.create_task(runner(), name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        # No-op once coro has run; otherwise it was cancelled before it
+        # started and would be reported as never awaited.
+        task.add_done_callback(lambda _: coro.close())
+        return task
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        # Released here rather than in runner() so a task cancelled before it
+        # ever started is still accounted for.
+        self._tasks.discard(task)
+        self._exit()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background task %s failed: %s", task.get_name(), task.exception())
+
+    # ── Shutdown ──────────────────────────────────────────────────────────────
+
+    def close(self) -> None:
+        """Stop accepting new work; already running work is unaffected."""
+        self._accepting = False
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Wait up to *timeout* seconds for all in-flight work to finish, then
+        cancel any remaining background tasks.
+
+        Returns True if everything finished before the deadline.
+        """
+        if self._inflight:
+            logger.info("Draining %s in-flight task(s) (deadline %.0fs)…", self._inflight, timeout)
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            pending = list(self._tasks)
+            logger.warning(
+                "Drain deadline reached with %s task(s) in flight; cancelling %s background task(s).",
+                self._inflight,
+                len(pending),
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            return False
+
+
+async def stop_within(step: Awaitable, timeout: float, what: str) -> bool:
+    """
+    Await one shutdown step (e.g. ``app.stop()``) for at most *timeout*
+    seconds.
+
+    Pyrogram's Client.stop() waits for every dispatcher worker, so a handler
+    that outlived drain() – stuck in a long FloodWait sleep, say – would
+    otherwise hold shutdown open until systemd kills the process.  On
+    timeout the step is cancelled, which cancels the handler work it was
+    waiting on, and False is returned so the caller can still flush and
+    close what it owns.
+    """
+    try:
+        await asyncio.wait_for(step, timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        logger.warning("%s did not finish within %.0fs – cancelled.", what, timeout)
+        return False
@@ -0,0 +1,37 @@
+"""
+conftest.py – Test setup shared by every test module.
+
+shared/config.py reads its required settings at import time, so dummy
+values are filled in here before any shared module is imported.  Real
+values from the environment (or .env) take precedence.
+"""
+
+import importlib
+import os
+import sys
+import types
+from pathlib import Path
+
+_DUMMY_ENV = {
+    "API_ID": "1",
+    "API_HASH": "test",
+    "AUTO_POSTER_BOT_TOKEN": "test",
+    "FILE_STORE_BOT_TOKEN": "test",
+    "SOURCE_CHANNEL": "-1000000000001",
+    "MAIN_CHANNEL": "-1000000000002",
+    "FILE_STORE_BOT_USERNAME": "TestFileBot",
+    "OMDB_API_KEY": "test",
+}
+
+for _name, _value in _DUMMY_ENV.items():
+    os.environ.setdefault(_name, _value)
+
+# The shared modules use relative imports, so they must be importable as the
+# "shared" package.  When this directory is not already on the path under
+# that name (e.g. a checkout that is not named shared/), register it as one.
+try:
+    importlib.import_module("shared.utils")
+except ImportError:
+    _package = types.ModuleType("shared")
+    _package.__path__ = [str(Path(__file__).resolve().parent.parent)]
+    sys.modules["shared"] = _package
@@ -0,0 +1,112 @@
+"""
+Tests for the export / import round trip in shared.catalog.
+
+get_db() is pointed at a small in-memory stand-in for the ``movies``
+collection, so the JSONL(.gz) files are real but no MongoDB is needed.
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from shared import catalog
+from shared.catalog import export_catalog, import_catalog
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction):
+        self._docs = sorted(self._docs, key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield dict(doc)
+
+
+class _Movies:
+    """Just enough of a Motor collection for export_catalog / import_catalog."""
+
+    def __init__(self, docs=()):
+        self.docs = {doc["_id"]: dict(doc) for doc in docs}
+
+    def find(self, query):
+        return _Cursor(list(self.docs.values()))
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["_id"] in self.docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+        return type("InsertManyResult", (), {"inserted_ids": [doc["_id"] for doc in docs]})()
+
+
+def _documents(count: int) -> list[dict]:
+    return [
+        {
+            "_id": ObjectId(),
+            "unique_id": f"id{i:06d}",
+            "cleaned_title": f"Movie {i} – Ünïcode",
+            "quality": "1080p",
+            "languages": ["tamil"],
+            "imdb": {"title": f"Movie {i}", "year": "N/A"},
+            "created_at": datetime(2024, 1, 2, 3, 4, 5, (i % 1000) * 1000),
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def movies(monkeypatch):
+    def install(docs=()):
+        collection = _Movies(docs)
+        monkeypatch.setattr(catalog, "get_db", lambda: {"movies": collection})
+        return collection
+
+    return install
+
+
+@pytest.mark.parametrize("filename", ["movies.jsonl", "movies.jsonl.gz"])
+def test_export_import_round_trip(movies, tmp_path, filename):
+    original = _documents(25)
+    path = str(tmp_path / filename)
+
+    movies(original)
+    exported = asyncio.run(export_catalog(path, batch_size=10))
+
+    target = movies()
+    inserted, duplicates = asyncio.run(import_catalog(path, batch_size=10))
+
+    assert exported == 25
+    assert (inserted, duplicates) == (25, 0)
+    # ObjectId and datetime values survive; datetimes keep millisecond precision
+    assert target.docs == {doc["_id"]: doc for doc in original}
+
+
+def test_import_counts_existing_documents_as_duplicates(movies, tmp_path):
+    original = _documents(12)
+    path = str(tmp_path / "movies.jsonl.gz")
+
+    movies(original)
+    asyncio.run(export_catalog(path, batch_size=5))
+
+    target = movies(original[:7])
+    inserted, duplicates = asyncio.run(import_catalog(path, batch_size=5))
+
+    assert (inserted, duplicates) == (5, 7)
+    assert len(target.docs) == 12
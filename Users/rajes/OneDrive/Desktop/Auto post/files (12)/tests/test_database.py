@@ -0,0 +1,85 @@
+"""
+Tests for the query-building helpers in shared.database.
+
+_find_bundle_key runs against a small in-memory stand-in for the
+``bundles`` collection; nothing here needs a MongoDB server.
+"""
+
+import asyncio
+import re
+
+import pytest
+
+from shared import database
+from shared.database import _dedup_key_filter, _find_bundle_key
+
+
+# ── _dedup_key_filter ──────────────────────────────────────────────────────────
+
+def test_key_with_year_matches_same_year_and_yearless():
+    assert _dedup_key_filter("dune|2021") == {"$in": ["dune|2021", "dune"]}
+
+
+def test_yearless_key_matches_only_yearless():
+    assert _dedup_key_filter("dune") == "dune"
+
+
+# ── _find_bundle_key ───────────────────────────────────────────────────────────
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length):
+        return self._docs[:length]
+
+
+class _Bundles:
+    """Just enough of a Motor collection for _find_bundle_key()."""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+
+    def _matching(self, query):
+        wanted = query["key"]
+        if isinstance(wanted, re.Pattern):
+            return [{"key": key} for key in self.keys if wanted.search(key)]
+        return [{"key": key} for key in self.keys if key == wanted]
+
+    async def find_one(self, query, projection=None):
+        docs = self._matching(query)
+        return docs[0] if docs else None
+
+    def find(self, query, projection=None):
+        return _Cursor(self._matching(query))
+
+
+@pytest.fixture
+def bundles(monkeypatch):
+    def install(*keys):
+        collection = _Bundles(keys)
+        monkeypatch.setattr(database, "get_db", lambda: {"bundles": collection})
+
+    return install
+
+
+@pytest.mark.parametrize(
+    "stored, dedup_key, expected",
+    [
+        ([], "dune|2021", "dune|2021#"),
+        (["dune|2021#"], "dune|2021", "dune|2021#"),
+        # A year in the filename joins the backfilled, yearless bundle
+        (["dune#"], "dune|2021", "dune#"),
+        # No year joins the only year stored for the title
+        (["dune|2021#"], "dune", "dune|2021#"),
+        # ... but not when several years (remakes) make it ambiguous
+        (["dune|1984#", "dune|2021#"], "dune", "dune#"),
+        (["dune#", "dune|2021#"], "dune", "dune#"),
+        # Other titles and other language sets never match
+        (["dune part two|2024#", "dune|2021#tamil"], "dune", "dune#"),
+    ],
+)
+def test_find_bundle_key(bundles, stored, dedup_key, expected):
+    bundles(*stored)
+
+    assert asyncio.run(_find_bundle_key(dedup_key, "")) == expected
@@ -0,0 +1,168 @@
+"""
+Tests for the write-behind buffer in shared.delivery_log.
+
+The two database writes are replaced with recorders, so these tests cover
+only the buffering and retry bookkeeping around them.
+"""
+
+import asyncio
+
+import pytest
+
+from shared import delivery_log
+from shared.delivery_log import DeliveryLog
+
+
+class FakeStore:
+    """Records every flush call and answers from scripted results."""
+
+    def __init__(self, count_results=(), insert_results=()):
+        self.count_calls: list[dict] = []
+        self.insert_calls: list[list[str]] = []
+        self._count_results = list(count_results)
+        self._insert_results = list(insert_results)
+
+    @staticmethod
+    def _next(results, default):
+        result = results.pop(0) if results else default
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def increment_downloads(self, counts):
+        self.count_calls.append(dict(counts))
+        return self._next(self._count_results, {})
+
+    async def insert_deliveries(self, events):
+        self.insert_calls.append([event["unique_id"] for event in events])
+        outcome = self._next(self._insert_results, [])
+        # Scripted as the number of leading events that failed
+        return events[:outcome] if isinstance(outcome, int) else outcome
+
+    async def top(self, limit):
+        return []
+
+
+@pytest.fixture
+def store(monkeypatch):
+    def install(**results):
+        fake = FakeStore(**results)
+        monkeypatch.setattr(delivery_log, "increment_downloads", fake.increment_downloads)
+        monkeypatch.setattr(delivery_log, "insert_deliveries", fake.insert_deliveries)
+        monkeypatch.setattr(delivery_log, "top_downloads", fake.top)
+        monkeypatch.setattr(delivery_log, "top_recent_deliveries", fake.top)
+        return fake
+
+    return install
+
+
+def test_flush_writes_counts_and_events(store):
+    fake = store()
+
+    async def scenario():
+        log = DeliveryLog()
+        for uid in ("a", "a", "b"):
+            log.record(uid, user_id=1)
+        await log.flush()
+        return log
+
+    log = asyncio.run(scenario())
+
+    assert fake.count_calls == [{"a": 2, "b": 1}]
+    assert fake.insert_calls == [["a", "a", "b"]]
+    assert log.pending == 0
+
+
+def test_failed_stages_retry_independently(store):
+    fake = store(
+        count_results=[{"b": 1}],  # "a" applied, "b" failed
+        insert_results=[ConnectionError("down")],
+    )
+
+    async def scenario():
+        log = DeliveryLog()
+        for uid in ("a", "a", "b"):
+            log.record(uid, user_id=1)
+        await log.flush()
+        log.record("c", user_id=2)
+        await log.flush()
+        return log
+
+    log = asyncio.run(scenario())
+
+    # Only the failed counter is re-sent; the applied "a" is not counted again
+    assert fake.count_calls == [{"a": 2, "b": 1}, {"b": 1, "c": 1}]
+    # The failed trail insert is retried in full, independently of the counters
+    assert fake.insert_calls == [["a", "a", "b"], ["a", "a", "b", "c"]]
+    assert log.pending == 0
+
+
+def test_partial_insert_failure_keeps_only_failed_events(store):
+    fake = store(insert_results=[1])
+
+    async def scenario():
+        log = DeliveryLog()
+        for uid in ("a", "b", "c"):
+            log.record(uid, user_id=1)
+        await log.flush()
+        pending = log.pending
+        await log.flush()
+        return pending
+
+    pending = asyncio.run(scenario())
+
+    assert pending == 1
+    assert fake.insert_calls == [["a", "b", "c"], ["a"]]
+    assert fake.count_calls == [{"a": 1, "b": 1, "c": 1}]
+
+
+def test_unwritten_events_beyond_the_limit_are_dropped_oldest_first(store):
+    fake = store(insert_results=[ConnectionError("down")] * 3)
+
+    async def scenario():
+        log = DeliveryLog(max_events=3)
+        for uid in ("a", "b"):
+            log.record(uid, user_id=1)
+        await log.flush()
+        for uid in ("c", "d"):
+            log.record(uid, user_id=1)
+        await log.flush()
+        return log
+
+    log = asyncio.run(scenario())
+
+    assert log.dropped == 1
+    assert log.pending == 3
+    assert fake.insert_calls[-1] == ["b", "c", "d"]
+
+
+def test_full_buffer_counts_dropped_events(store):
+    store()
+
+    async def scenario():
+        log = DeliveryLog(max_events=2)
+        for uid in ("a", "b", "c"):
+            log.record(uid, user_id=1)
+        return log
+
+    log = asyncio.run(scenario())
+
+    assert log.dropped == 1
+    assert log.pending == 2
+
+
+def test_stop_flushes_what_is_buffered(store):
+    fake = store()
+
+    async def scenario():
+        log = DeliveryLog(flush_interval=3600)
+        log.start()
+        await asyncio.sleep(0)
+        log.record("a", user_id=1)
+        await log.stop()
+        return log
+
+    log = asyncio.run(scenario())
+
+    assert ["a"] in fake.insert_calls
+    assert log.pending == 0
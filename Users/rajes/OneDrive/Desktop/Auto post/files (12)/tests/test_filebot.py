@@ -0,0 +1,142 @@
+"""
+Tests for FileStoreBot's bundle delivery.
+
+The bot module is loaded from its file (it is an entry point, not part of
+the shared package).  Nothing here talks to Telegram: Client() does not
+connect until started, and the send calls go to a recording fake.
+"""
+
+import asyncio
+import importlib.util
+import types
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyrogram")
+
+from pyrogram.errors import FloodWait  # noqa: E402
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _load_filebot():
+    candidates = [_ROOT.parent / "filebot" / "main.py", *sorted(_ROOT.glob("**/filebot/main.py"))]
+    path = next((p for p in candidates if p.is_file()), None)
+    if path is None:
+        pytest.skip("filebot/main.py not found")
+    spec = importlib.util.spec_from_file_location("filebot_main", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+filebot = _load_filebot()
+
+
+def _movie(uid: str, media_type: str = "video", quality: str = "1080p") -> dict:
+    return {
+        "unique_id": uid,
+        "file_id": f"file-{uid}",
+        "cleaned_title": "Vikram",
+        "quality": quality,
+        "media_type": media_type,
+    }
+
+
+def _ids(chunks: list[list[dict]]) -> list[list[str]]:
+    return [[movie["unique_id"] for movie in chunk] for chunk in chunks]
+
+
+# ── _bundle_chunks ─────────────────────────────────────────────────────────────
+
+def test_bundle_chunks_keeps_order_within_one_album():
+    movies = [_movie("4k"), _movie("1080"), _movie("720")]
+
+    assert _ids(filebot._bundle_chunks(movies)) == [["4k", "1080", "720"]]
+
+
+def test_bundle_chunks_splits_by_media_type_in_first_seen_order():
+    movies = [_movie("v1"), _movie("d1", "document"), _movie("v2"), _movie("d2", "document")]
+
+    assert _ids(filebot._bundle_chunks(movies)) == [["v1", "v2"], ["d1", "d2"]]
+
+
+def test_bundle_chunks_respects_the_album_limit():
+    movies = [_movie(f"m{i}") for i in range(23)]
+
+    chunks = filebot._bundle_chunks(movies)
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 3]
+    assert [m["unique_id"] for chunk in chunks for m in chunk] == [f"m{i}" for i in range(23)]
+
+
+def test_bundle_chunks_reads_media_type_from_old_documents():
+    legacy = _movie("old")
+    del legacy["media_type"]
+    legacy["file_id"] = "not-a-real-file-id"
+
+    assert _ids(filebot._bundle_chunks([legacy, _movie("new", "document")])) == [["old", "new"]]
+
+
+# ── _handle_bundle ─────────────────────────────────────────────────────────────
+
+class FakeClient:
+    """Records albums and single files; raises FloodWait on scripted calls."""
+
+    def __init__(self, flood_on_call: int):
+        self.calls = 0
+        self.sent: list[list[str]] = []
+        self._flood_on_call = flood_on_call
+
+    def _send(self, file_ids: list[str]) -> None:
+        self.calls += 1
+        if self.calls == self._flood_on_call:
+            raise FloodWait(value=0)
+        self.sent.append(file_ids)
+
+    async def send_media_group(self, chat_id, media):
+        self._send([item.media for item in media])
+
+    async def send_video(self, chat_id, video, **kwargs):
+        self._send([video])
+
+
+class FakeMessage:
+    def __init__(self):
+        self.chat = types.SimpleNamespace(id=42)
+        self.from_user = types.SimpleNamespace(id=7)
+        self.ack = types.SimpleNamespace(deleted=False)
+
+    async def reply_text(self, text, **kwargs):
+        async def delete():
+            self.ack.deleted = True
+
+        self.ack.delete = delete
+        return self.ack
+
+
+def test_flood_wait_resumes_from_the_failed_album(monkeypatch):
+    movies = [_movie(f"v{i}") for i in range(12)] + [_movie("d0", "document")]
+    recorded: list[str] = []
+
+    async def get_movies(bundle_id):
+        return [dict(movie) for movie in movies]
+
+    monkeypatch.setattr(filebot, "get_movies_by_bundle_id", get_movies)
+    monkeypatch.setattr(
+        filebot, "delivery_log", types.SimpleNamespace(record=lambda uid, user: recorded.append(uid))
+    )
+
+    client = FakeClient(flood_on_call=2)  # the second album hits FloodWait once
+    message = FakeMessage()
+    asyncio.run(filebot._handle_bundle(client, message, "AbCd1234"))
+
+    # First album sent once, second retried after the wait, then the rest
+    assert client.sent == [
+        [f"file-v{i}" for i in range(10)],
+        ["file-v10", "file-v11"],
+        ["file-d0"],
+    ]
+    assert sorted(recorded) == sorted(movie["unique_id"] for movie in movies)
+    assert message.ack.deleted
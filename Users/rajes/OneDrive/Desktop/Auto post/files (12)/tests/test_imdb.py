@@ -0,0 +1,188 @@
+"""
+Tests for the metadata provider race in shared.imdb.
+
+Every OmdbProvider points at a local aiohttp.web stub, so the real HTTP
+client path (timeouts, cancellation, JSON parsing) is exercised without
+network access.
+"""
+
+import asyncio
+import contextlib
+import socket
+import time
+
+import pytest
+from aiohttp import web
+
+from shared import imdb
+from shared.imdb import MetadataProvider, OmdbProvider, fetch_imdb_data, set_providers
+
+_HIT = {
+    "Response": "True",
+    "Title": "Vikram",
+    "Year": "2022",
+    "imdbRating": "8.3",
+    "Genre": "Action",
+    "Director": "Lokesh Kanagaraj",
+    "Plot": "N/A",
+    "Poster": "N/A",
+}
+
+
+@contextlib.asynccontextmanager
+async def stub_server():
+    """
+    Serve /hit, /miss, /error and /slow on a free local port; yields the base URL.
+    /slow blocks until the server shuts down, so it only ends by timeout or cancel.
+    """
+    release = asyncio.Event()
+
+    async def hit(request):
+        return web.json_response(_HIT)
+
+    async def miss(request):
+        return web.json_response({"Response": "False", "Error": "Movie not found!"})
+
+    async def error(request):
+        return web.Response(status=500)
+
+    async def slow(request):
+        await release.wait()
+        return web.json_response(_HIT)
+
+    app = web.Application()
+    app.router.add_get("/hit", hit)
+    app.router.add_get("/miss", miss)
+    app.router.add_get("/error", error)
+    app.router.add_get("/slow", slow)
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.SockSite(runner, sock).start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        release.set()
+        await runner.cleanup()
+
+
+def _provider(base_url: str, path: str, timeout: float = 5.0) -> OmdbProvider:
+    return OmdbProvider(path, f"{base_url}/{path}", "test", timeout)
+
+
+@pytest.fixture(autouse=True)
+def restore_providers():
+    yield
+    set_providers([])
+
+
+def test_metadata_provider_is_abstract():
+    with pytest.raises(TypeError):
+        MetadataProvider(1.0)
+
+
+def test_first_hit_wins_and_the_rest_are_cancelled(monkeypatch):
+    monkeypatch.setattr(imdb, "METADATA_HEDGE_DELAY", 0)
+
+    async def scenario():
+        async with stub_server() as url:
+            slow, hit = _provider(url, "slow"), _provider(url, "hit")
+            set_providers([slow, hit])
+            result = await fetch_imdb_data("Vikram")
+            return result, slow, hit
+
+    result, slow, hit = asyncio.run(scenario())
+
+    assert result["title"] == "Vikram"
+    assert result["year"] == "2022"
+    assert hit.stats.hits == 1
+    assert slow.stats.calls == 1
+    assert slow.stats.cancelled == 1
+    assert slow.stats.timeouts == 0
+    assert not slow.breaker.is_open
+
+
+def test_hedge_starts_next_provider_after_delay(monkeypatch):
+    monkeypatch.setattr(imdb, "METADATA_HEDGE_DELAY", 0.1)
+
+    async def scenario():
+        async with stub_server() as url:
+            slow, hit = _provider(url, "slow"), _provider(url, "hit")
+            set_providers([slow, hit])
+            started = time.monotonic()
+            result = await fetch_imdb_data("Vikram")
+            return result, time.monotonic() - started, slow, hit
+
+    result, elapsed, slow, hit = asyncio.run(scenario())
+
+    assert result["title"] == "Vikram"
+    assert 0.1 <= elapsed < 2
+    assert hit.stats.hits == 1
+    assert slow.stats.cancelled == 1
+
+
+def test_miss_and_failure_release_next_provider_immediately(monkeypatch):
+    monkeypatch.setattr(imdb, "METADATA_HEDGE_DELAY", 10)
+
+    async def scenario():
+        async with stub_server() as url:
+            miss, error, hit = _provider(url, "miss"), _provider(url, "error"), _provider(url, "hit")
+            set_providers([miss, error, hit])
+            started = time.monotonic()
+            result = await fetch_imdb_data("Vikram")
+            return result, time.monotonic() - started, miss, error, hit
+
+    result, elapsed, miss, error, hit = asyncio.run(scenario())
+
+    assert result["year"] == "2022"
+    assert elapsed < 2
+    assert miss.stats.misses == 1
+    assert error.stats.failures == 1
+    assert hit.stats.hits == 1
+
+
+def test_miss_releases_next_provider_while_another_is_running(monkeypatch):
+    monkeypatch.setattr(imdb, "METADATA_HEDGE_DELAY", 0.5)
+
+    async def scenario():
+        async with stub_server() as url:
+            slow, miss, hit = _provider(url, "slow"), _provider(url, "miss"), _provider(url, "hit")
+            set_providers([slow, miss, hit])
+            started = time.monotonic()
+            result = await fetch_imdb_data("Vikram")
+            return result, time.monotonic() - started, slow, miss, hit
+
+    result, elapsed, slow, miss, hit = asyncio.run(scenario())
+
+    # slow starts at 0, miss after one hedge delay; its miss starts hit at once
+    # instead of after a second delay
+    assert result["year"] == "2022"
+    assert 0.5 <= elapsed < 0.9
+    assert miss.stats.misses == 1
+    assert hit.stats.hits == 1
+    assert slow.stats.cancelled == 1
+
+
+def test_timeouts_are_counted_and_open_the_breaker(monkeypatch):
+    monkeypatch.setattr(imdb, "METADATA_HEDGE_DELAY", 0)
+
+    async def scenario():
+        async with stub_server() as url:
+            slow = _provider(url, "slow", timeout=0.05)
+            slow.breaker.threshold = 2
+            set_providers([slow])
+            results = [await fetch_imdb_data("Vikram") for _ in range(3)]
+            return results, slow
+
+    results, slow = asyncio.run(scenario())
+
+    assert all(result == imdb.empty_imdb_data("Vikram") for result in results)
+    assert slow.stats.calls == 2
+    assert slow.stats.timeouts == 2
+    assert slow.stats.skipped == 1
+    assert slow.breaker.is_open
+    assert imdb.provider_stats()["slow"]["circuit_open"] is True
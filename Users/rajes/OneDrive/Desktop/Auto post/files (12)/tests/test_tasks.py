@@ -0,0 +1,113 @@
+"""Tests for the shutdown registry in shared.tasks."""
+
+import asyncio
+import inspect
+
+from shared.tasks import TaskRegistry, stop_within
+
+
+def test_drain_waits_for_tracked_handlers():
+    async def scenario():
+        registry = TaskRegistry()
+        finished = []
+
+        @registry.tracked()
+        async def handler(n):
+            await asyncio.sleep(0.05)
+            finished.append(n)
+
+        calls = [asyncio.create_task(handler(n)) for n in range(3)]
+        await asyncio.sleep(0)
+        inflight = registry.inflight
+        registry.close()
+        drained = await registry.drain(timeout=1)
+        await asyncio.gather(*calls)
+        return inflight, drained, finished, registry.inflight
+
+    inflight, drained, finished, remaining = asyncio.run(scenario())
+
+    assert inflight == 3
+    assert drained is True
+    assert sorted(finished) == [0, 1, 2]
+    assert remaining == 0
+
+
+def test_closed_registry_rejects_handlers():
+    async def scenario():
+        registry = TaskRegistry()
+        ran, rejected = [], []
+
+        async def on_reject(*args):
+            rejected.append(args)
+
+        @registry.tracked(on_reject=on_reject)
+        async def handler(client, message):
+            ran.append(message)
+
+        await handler("client", "first")
+        registry.close()
+        await handler("client", "second")
+        return ran, rejected, registry.accepting
+
+    ran, rejected, accepting = asyncio.run(scenario())
+
+    assert ran == ["first"]
+    assert rejected == [("client", "second")]
+    assert accepting is False
+
+
+def test_drain_timeout_cancels_background_tasks():
+    async def scenario():
+        registry = TaskRegistry()
+        task = registry.spawn(asyncio.sleep(10), name="stuck")
+        await asyncio.sleep(0)
+        drained = await registry.drain(timeout=0.05)
+        return drained, task.cancelled(), registry.inflight
+
+    drained, cancelled, inflight = asyncio.run(scenario())
+
+    assert drained is False
+    assert cancelled is True
+    assert inflight == 0
+
+
+def test_task_cancelled_before_it_starts_is_closed_not_leaked():
+    started = []
+
+    async def job(n):
+        started.append(n)
+        await asyncio.sleep(10)
+
+    queued = job(2)
+
+    async def scenario():
+        registry = TaskRegistry(max_concurrency=1)
+        registry.spawn(job(1))
+        task = registry.spawn(queued)  # waits for the semaphore
+        await asyncio.sleep(0)
+        await registry.drain(timeout=0)
+        return task
+
+    task = asyncio.run(scenario())
+
+    assert task.cancelled()
+    assert started == [1]
+    # Closed rather than left un-awaited ("coroutine ... was never awaited")
+    assert inspect.getcoroutinestate(queued) == inspect.CORO_CLOSED
+
+
+def test_stop_within_cancels_a_step_that_overruns():
+    async def scenario():
+        worker = asyncio.create_task(asyncio.sleep(10))
+
+        async def stop():
+            # Shaped like Pyrogram's Dispatcher.stop(): awaits a handler worker
+            await worker
+
+        stopped = await stop_within(stop(), timeout=0.05, what="Client stop")
+        return stopped, worker.cancelled()
+
+    stopped, worker_cancelled = asyncio.run(scenario())
+
+    assert stopped is False
+    assert worker_cancelled is True
@@ -0,0 +1,111 @@
+"""Tests for dedup keys, language detection and channel routing in shared.utils."""
+
+import pytest
+
+from shared import utils
+from shared.utils import (
+    canonical_routes,
+    detect_languages,
+    make_dedup_key,
+    make_lang_key,
+    resolve_destinations,
+)
+
+
+# ── make_dedup_key ─────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize(
+    "title, year, expected",
+    [
+        ("Spider-Man No Way Home", "2021", "spider man no way home|2021"),
+        ("The Spider-Man: No Way Home", None, "spider man no way home"),
+        ("  AMÉLIE  ", "2001", "amelie|2001"),
+        ("Leon", "1994–1995", "leon|1994"),
+        ("Inception", "N/A", "inception"),
+    ],
+)
+def test_make_dedup_key_latin(title, year, expected):
+    assert make_dedup_key(title, year) == expected
+
+
+def test_make_dedup_key_keeps_non_latin_titles():
+    tamil = make_dedup_key("விக்ரம்")
+    cyrillic = make_dedup_key("Брат 2", "2000")
+
+    assert tamil  # combining vowel signs must survive folding
+    assert tamil != make_dedup_key("விக்ரம வேதா")
+    assert cyrillic == "брат 2|2000"
+
+
+def test_make_dedup_key_distinct_non_latin_titles_differ():
+    assert make_dedup_key("கைதி") != make_dedup_key("காதல்")
+
+
+@pytest.mark.parametrize("title", ["", "   ", "!!!", "-- ..."])
+def test_make_dedup_key_empty_is_none(title):
+    assert make_dedup_key(title, "2020") is None
+
+
+# ── detect_languages / make_lang_key ───────────────────────────────────────────
+
+@pytest.mark.parametrize(
+    "filename, expected",
+    [
+        ("Vikram.2022.Tamil.1080p.WEB-DL.mkv", ["tamil"]),
+        ("Jawan_2023_Hindi_Tam_Tel_720p.mp4", ["hindi", "tamil", "telugu"]),
+        ("Movie.2020.TAMIL.tamil.Tam.mkv", ["tamil"]),
+        ("Oppenheimer.2023.1080p.ESub.mkv", []),
+        ("Leo.2023.Dual.Eng.Subs.mkv", ["dual", "english"]),
+        ("Mallika.2019.720p.mkv", []),
+    ],
+)
+def test_detect_languages(filename, expected):
+    assert detect_languages(filename) == expected
+
+
+def test_make_lang_key_is_order_independent():
+    assert make_lang_key(["tamil", "hindi"]) == make_lang_key(["hindi", "tamil"]) == "hindi,tamil"
+    assert make_lang_key([]) == ""
+
+
+# ── resolve_destinations ───────────────────────────────────────────────────────
+
+@pytest.fixture
+def routes(monkeypatch):
+    monkeypatch.setattr(utils, "MAIN_CHANNEL", -100)
+    monkeypatch.setattr(
+        utils,
+        "CHANNEL_ROUTES",
+        {"tamil": [-1, -2], "telugu": [-2, -3], "*": [-9]},
+    )
+
+
+def test_resolve_destinations_merges_rules_without_duplicates(routes):
+    assert resolve_destinations(["tamil", "telugu"]) == [-1, -2, -3, -9]
+
+
+def test_resolve_destinations_wildcard_only(routes):
+    assert resolve_destinations(["hindi"]) == [-9]
+
+
+def test_resolve_destinations_falls_back_to_main_channel(monkeypatch):
+    monkeypatch.setattr(utils, "MAIN_CHANNEL", -100)
+    monkeypatch.setattr(utils, "CHANNEL_ROUTES", {"tamil": [-1]})
+
+    assert resolve_destinations(["hindi"]) == [-100]
+    assert resolve_destinations([]) == [-100]
+
+
+# ── canonical_routes ───────────────────────────────────────────────────────────
+
+def test_canonical_routes_maps_aliases_and_merges():
+    routes = canonical_routes({"tam": [-1], "tamil": [-1, -2], "hin": [-3], "*": [-9]})
+
+    assert routes == {"tamil": [-1, -2], "hindi": [-3], "*": [-9]}
+
+
+def test_canonical_routes_drops_unknown_and_subtitle_rules(caplog):
+    routes = canonical_routes({"klingon": [-1], "esub": [-2], "telugu": [-3]})
+
+    assert routes == {"telugu": [-3]}
+    assert "klingon" in caplog.text
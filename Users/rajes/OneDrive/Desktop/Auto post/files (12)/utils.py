@@ -4,16 +4,21 @@ utils.py – Pure utility functions (no I/O, no network, fully synchronous).
 Responsibilities:
     • Filename → cleaned movie title
     • Filename → quality tag
+    • Filename → release year
+    • Filename → audio languages → destination channels
+    • Title (+ year) → canonical dedup key
     • Generate cryptographically random unique IDs
-    • Deep-link builder
+    • Deep-link builders (single file and all-qualities bundle)
 """
 
 import re
 import string
 import secrets
 import logging
+import unicodedata
 
-from .config import UNIQUE_ID_LENGTH, FILE_STORE_BOT_USERNAME
+from .config import UNIQUE_ID_LENGTH, FILE_STORE_BOT_USERNAME, MAIN_CHANNEL
+from .config import CHANNEL_ROUTES as _CONFIGURED_ROUTES
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +72,22 @@ _RE_LANGUAGES = re.compile(
     flags=re.IGNORECASE,
 )
 
+# Canonical names for language tags matched by _RE_LANGUAGES.  Subtitle-only
+# tags map to None – they say nothing about the audio language.
+_LANGUAGE_ALIASES: dict[str, str | None] = {
+    "tamil": "tamil", "tam": "tamil",
+    "telugu": "telugu", "tel": "telugu",
+    "hindi": "hindi", "hin": "hindi",
+    "malayalam": "malayalam", "mal": "malayalam",
+    "kannada": "kannada", "kan": "kannada",
+    "bengali": "bengali", "ben": "bengali",
+    "punjabi": "punjabi",
+    "marathi": "marathi",
+    "english": "english", "eng": "english",
+    "dual": "dual", "multi": "multi", "dubbed": "dubbed",
+    "subbed": None, "esubs": None, "esub": None, "subs": None, "sub": None,
+}
+
 # Release group tags commonly appended after a hyphen (e.g. "-YIFY", "-RARBG")
 _RE_RELEASE_GROUP = re.compile(
     r"[-]\s*(?:yify|yts|rarbg|ettv|eztv|publichd|fgt|ntb|ion10|cmrg|"
@@ -91,6 +112,12 @@ _RE_MULTI_SPACE = re.compile(r"\s{2,}")
 # File extension (last dot + up to 5 chars, end of string)
 _RE_EXTENSION = re.compile(r"\.[a-zA-Z0-9]{2,5}$")
 
+# First 4-digit year in a free-form string (e.g. OMDb "2019–2022")
+_RE_ANY_YEAR = re.compile(r"(?:19|20)\d{2}")
+
+# Dedup key normalisation: a single leading (English) article
+_RE_LEADING_ARTICLE = re.compile(r"^(?:the|a|an) ")
+
 # ── Quality extraction ─────────────────────────────────────────────────────────
 
 # Normalise filename for quality matching (replace separators with spaces)
@@ -119,6 +146,72 @@ def extract_quality(filename: str) -> str:
     return "HD"
 
 
+# ── Language detection / routing ───────────────────────────────────────────────
+
+def detect_languages(filename: str) -> list[str]:
+    """
+    Return the canonical audio-language tags found in *filename*, in order
+    of appearance and without duplicates (e.g. ["tamil", "hindi"]).
+    """
+    name = re.sub(r"[._]", " ", _RE_EXTENSION.sub("", filename))
+    found: list[str] = []
+    for match in _RE_LANGUAGES.finditer(name):
+        lang = _LANGUAGE_ALIASES.get(match.group(0).lower())
+        if lang and lang not in found:
+            found.append(lang)
+    return found
+
+
+def make_lang_key(languages: list[str]) -> str:
+    """
+    Order-independent key for a language set, used alongside the dedup key
+    so language variants of one title are not treated as duplicates.
+
+        make_lang_key(["tamil", "hindi"]) → "hindi,tamil"
+        make_lang_key([])                 → ""
+    """
+    return ",".join(sorted(set(languages)))
+
+
+def canonical_routes(routes: dict[str, list[int]]) -> dict[str, list[int]]:
+    """
+    Re-key CHANNEL_ROUTES rules by canonical language name, so a rule for
+    "tam" matches what detect_languages() returns ("tamil").  Rules for
+    unknown or subtitle-only tags could never match; they are dropped with
+    an error in the log.
+    """
+    canonical: dict[str, list[int]] = {}
+    for key, chat_ids in routes.items():
+        lang = key if key == "*" else _LANGUAGE_ALIASES.get(key)
+        if lang is None:
+            logger.error("CHANNEL_ROUTES: unknown language '%s' – rule ignored.", key)
+            continue
+        targets = canonical.setdefault(lang, [])
+        for chat_id in chat_ids:
+            if chat_id not in targets:
+                targets.append(chat_id)
+    return canonical
+
+
+# Routing rules keyed by canonical language name (see canonical_routes)
+CHANNEL_ROUTES: dict[str, list[int]] = canonical_routes(_CONFIGURED_ROUTES)
+
+
+def resolve_destinations(languages: list[str]) -> list[int]:
+    """
+    Map detected languages to destination channel IDs using CHANNEL_ROUTES.
+
+    Every matching rule contributes its channels; the ``*`` rule always
+    applies.  When nothing matches, the file goes to MAIN_CHANNEL.
+    """
+    destinations: list[int] = []
+    for key in (*languages, "*"):
+        for chat_id in CHANNEL_ROUTES.get(key, []):
+            if chat_id not in destinations:
+                destinations.append(chat_id)
+    return destinations or [MAIN_CHANNEL]
+
+
 # ── Title cleaning ─────────────────────────────────────────────────────────────
 
 def clean_title(filename: str) -> str:
@@ -165,6 +258,75 @@ def clean_title(filename: str) -> str:
     return title
 
 
+# ── Year extraction ────────────────────────────────────────────────────────────
+
+def extract_year(filename: str) -> str | None:
+    """
+    Return the release year embedded in *filename* (e.g. "2021"), or None.
+
+    When several years appear (e.g. "Blade.Runner.2049.2017.1080p") the last
+    one is taken, since titles may contain numbers but the release year is
+    conventionally the final year token before the quality tags.
+    """
+    name = re.sub(r"[._]", " ", _RE_EXTENSION.sub("", filename))
+    matches = [m.group(0) for m in _RE_YEAR.finditer(name)]
+    return matches[-1] if matches else None
+
+
+def normalise_year(value: str | None) -> str | None:
+    """Reduce a year-ish string ("2021", "2019–2022", "N/A") to 4 digits or None."""
+    if not value:
+        return None
+    match = _RE_ANY_YEAR.search(value)
+    return match.group(0) if match else None
+
+
+# ── Dedup key ──────────────────────────────────────────────────────────────────
+
+def _is_latin(ch: str) -> bool:
+    """True for Latin letters (Basic Latin through Latin Extended Additional)."""
+    return ch < "\u0250" or "\u1e00" <= ch <= "\u1eff"
+
+
+def _fold_title(title: str) -> str:
+    """
+    Casefold *title*, strip accents from Latin letters and turn punctuation,
+    symbols and separators into single spaces.  Letters, digits and marks
+    of every script are kept, so non-Latin titles stay distinct.
+    """
+    decomposed = unicodedata.normalize("NFKD", title.casefold())
+    chars: list[str] = []
+    for ch in decomposed:
+        if unicodedata.combining(ch) and chars and _is_latin(chars[-1]):
+            continue  # accent on a Latin letter: é → e
+        chars.append(ch if unicodedata.category(ch)[0] in "LNM" else " ")
+    text = unicodedata.normalize("NFC", "".join(chars))
+    return " ".join(text.split())
+
+
+def make_dedup_key(title: str, year: str | None = None) -> str | None:
+    """
+    Build the canonical key used for duplicate detection.
+
+    The title is casefolded, accents are stripped from Latin letters,
+    punctuation is dropped and a leading article is removed, so
+    "The Spider-Man: No Way Home" and "spider man no way home" collapse to
+    the same key.  The year, when known, is appended after a "|".
+
+        make_dedup_key("Spider-Man No Way Home", "2021")
+            → "spider man no way home|2021"
+
+    Returns None when nothing is left of the title (e.g. it was pure
+    punctuation) – such files must not be deduplicated at all.
+    """
+    text = _RE_LEADING_ARTICLE.sub("", _fold_title(title))
+    if not text:
+        return None
+
+    year = normalise_year(year)
+    return f"{text}|{year}" if year else text
+
+
 def generate_unique_id() -> str:
     """
     Return a URL-safe, cryptographically random alphanumeric string of
@@ -176,6 +338,10 @@ def generate_unique_id() -> str:
     return "".join(secrets.choice(alphabet) for _ in range(UNIQUE_ID_LENGTH))
 
 
+# /start payload prefix marking a bundle (all qualities of one title)
+BUNDLE_PREFIX = "all_"
+
+
 def build_deep_link(unique_id: str) -> str:
     """
     Build a Telegram start deep-link pointing to FileStoreBot.
@@ -184,11 +350,20 @@ def build_deep_link(unique_id: str) -> str:
     return f"https://t.me/{FILE_STORE_BOT_USERNAME}?start={unique_id}"
 
 
+def build_bundle_link(bundle_id: str) -> str:
+    """
+    Build a deep-link that delivers every quality of a title at once.
+    e.g. https://t.me/FileStoreBot?start=all_Qx7Lm2Pa
+    """
+    return build_deep_link(f"{BUNDLE_PREFIX}{bundle_id}")
+
+
 def format_post_caption(
     cleaned_title: str,
     quality: str,
     deep_link: str,
     imdb: dict,
+    bundle_link: str | None = None,
 ) -> str:
     """
     Build the HTML-formatted caption for the main channel post.
@@ -199,6 +374,7 @@ def format_post_caption(
         deep_link     : Download deep-link URL.
         imdb          : Dict with keys: title, year, rating, genre,
                         director, plot  (all strings, may be "N/A").
+        bundle_link   : Optional deep-link delivering all qualities at once.
     """
     title_display = imdb.get("title") or cleaned_title
     year = imdb.get("year", "N/A")
@@ -223,5 +399,7 @@ def format_post_caption(
         f"━━━━━━━━━━━━━━━━━━━━━━\n"
         f"📥 <b><a href=\"{deep_link}\">Download / Get File</a></b>"
     )
+    if bundle_link:
+        caption += f"\n📦 <b><a href=\"{bundle_link}\">Get All Qualities</a></b>"
 
     return caption